@@ -1,6 +1,13 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
-from django.utils.html import format_html
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models.functions import Substr
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
 from .models import User, Role, AuditLog, RestaurantSubscription, SubscriptionLog
 
 # Import Token model only if rest_framework is installed
@@ -11,6 +18,125 @@ except ImportError:
     HAS_REST_FRAMEWORK = False
     Token = None
 
+# Printer detection only works on Windows; resolve the import once
+try:
+    import win32print  # type: ignore
+    _HAS_WIN32PRINT = True
+except ImportError:
+    win32print = None
+    _HAS_WIN32PRINT = False
+
+# Printer enumeration is a blocking call to the Windows spooler, so cache it briefly
+AVAILABLE_PRINTERS_CACHE_KEY = 'available_printers'
+AVAILABLE_PRINTERS_CACHE_TIMEOUT = 60  # seconds
+
+
+def _enum_printers():
+    """Return the names of the local printers as a tuple"""
+    return tuple(
+        printer_info[2]
+        for printer_info in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL)
+    )
+
+
+def get_cached_printers():
+    """Return local printer names, enumerating at most once per cache timeout"""
+    return cache.get_or_set(
+        AVAILABLE_PRINTERS_CACHE_KEY, _enum_printers, AVAILABLE_PRINTERS_CACHE_TIMEOUT
+    )
+
+
+# HTML fragments for the readonly print fields. Static ones are built once at import.
+_REST_FRAMEWORK_MISSING_HTML = mark_safe(
+    '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
+    '<strong>REST Framework not installed</strong><br>'
+    '<small>Install: <code>pip install djangorestframework</code></small>'
+    '</div>'
+)
+_NO_TOKEN_HTML_TEMPLATE = (
+    '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
+    '<strong>No token generated yet</strong><br>'
+    '<small>Run: <code>python manage.py generate_print_token {}</code></small>'
+    '</div>'
+)
+_TOKEN_HTML_TEMPLATE = (
+    '<div style="padding: 10px; background: #f0f0f0; border-radius: 5px;">'
+    '<strong>API Token:</strong><br>'
+    '<code style="font-size: 14px; background: white; padding: 5px; display: inline-block; margin: 5px 0;">{0}</code><br>'
+    '<small>Use this token in print_client/config.json</small><br>'
+    '<a href="#" onclick="navigator.clipboard.writeText(\'{0}\'); alert(\'Token copied!\'); return false;" '
+    'style="display: inline-block; margin-top: 5px; padding: 5px 10px; background: #417690; color: white; '
+    'text-decoration: none; border-radius: 3px;">📋 Copy Token</a>'
+    '</div>'
+)
+_PRINTERS_HTML_TEMPLATE = (
+    '<div style="padding: 10px; background: #f0f0f0; border-radius: 5px;">'
+    '<strong>Available Printers:</strong><br>'
+    '<div style="margin-top: 5px; font-family: monospace; font-size: 12px;">{}</div>'
+    '<small style="color: #666; margin-top: 5px; display: block;">'
+    'Copy the exact printer name above and paste it into the printer fields.'
+    '</small>'
+    '</div>'
+)
+_NO_PRINTERS_HTML = mark_safe(
+    '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
+    'No printers found on this system.'
+    '</div>'
+)
+_WIN32PRINT_MISSING_HTML = mark_safe(
+    '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
+    '<strong>Win32print not available</strong><br>'
+    '<small>Printer detection only works on Windows systems.</small>'
+    '</div>'
+)
+_PRINTER_ERROR_HTML_TEMPLATE = (
+    '<div style="padding: 10px; background: #ffcccc; border-radius: 5px;">'
+    '<strong>Error detecting printers:</strong><br>'
+    '<small>{}</small>'
+    '</div>'
+)
+
+
+class FasterAdminPaginator(Paginator):
+    """
+    Paginator that uses the PostgreSQL planner estimate for unfiltered lists
+    instead of running a full COUNT(*) over large tables like the audit log.
+    """
+    
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or connection.vendor != 'postgresql':
+            return super().count
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        
+        # reltuples is -1 (or missing) until the table has been analyzed
+        if not row or row[0] < 0:
+            return super().count
+        return row[0]
+
+
+class AuditLogChangeList(ChangeList):
+    """
+    Changelist that only loads the columns shown in the list and truncates
+    descriptions in the database, skipping user_agent/extra_data entirely.
+    """
+    
+    def get_queryset(self, request, *args, **kwargs):
+        queryset = super().get_queryset(request, *args, **kwargs)
+        return queryset.only(
+            'id', 'created_at', 'event_type', 'username', 'ip_address'
+        ).annotate(
+            description_preview=Substr('description', 1, 101)
+        )
+
+
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
     list_display = ['name', 'description', 'created_at']
@@ -28,10 +154,18 @@ class AuditLogAdmin(admin.ModelAdmin):
                        'user_agent', 'extra_data', 'target_model', 'target_id', 'created_at']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
+    
+    def get_changelist(self, request, **kwargs):
+        return AuditLogChangeList
     
     def short_description(self, obj):
         """Truncate description for list display"""
-        return obj.description[:100] + '...' if len(obj.description) > 100 else obj.description
+        description = getattr(obj, 'description_preview', None)
+        if description is None:
+            description = obj.description
+        return description[:100] + '...' if len(description) > 100 else description
     short_description.short_description = 'Description'
     
     def has_add_permission(self, request):
@@ -43,124 +177,98 @@ class AuditLogAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser  # Only superusers can delete (for cleanup)
 
+
+# CustomUserAdmin fieldsets, concatenated with Django's UserAdmin defaults once at import
+_EXTRA_FIELDSETS = (
+    ('Additional Info', {
+        'fields': ('role', 'phone_number', 'address', 'is_active_staff')
+    }),
+    ('Restaurant Info (Owners Only)', {
+        'fields': ('restaurant_name', 'restaurant_description', 'restaurant_qr_code', 'tax_rate', 'owner'),
+        'classes': ('collapse',)
+    }),
+    ('Auto-Print Settings (Owners Only)', {
+        'fields': ('auto_print_kot', 'auto_print_bot'),
+    }),
+    ('Printer Configuration (Owners Only)', {
+        'fields': ('kitchen_printer_name', 'bar_printer_name', 'receipt_printer_name', 'get_available_printers'),
+        'description': 'Configure specific printers for different print jobs. Leave blank to use auto-detected printer.',
+    }),
+    ('Print Client Token', {
+        'fields': ('get_print_token',),
+        'classes': ('collapse',)
+    }),
+)
+_EXTRA_ADD_FIELDSETS = (
+    ('Additional Info', {
+        'fields': ('role', 'phone_number', 'address', 'is_active_staff')
+    }),
+)
+_USER_FIELDSETS = UserAdmin.fieldsets + _EXTRA_FIELDSETS
+_USER_ADD_FIELDSETS = UserAdmin.add_fieldsets + _EXTRA_ADD_FIELDSETS
+
+
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     list_display = ['username', 'email', 'first_name', 'last_name', 'role', 'is_active', 'has_print_token', 'created_at']
     list_filter = ['role', 'is_active', 'is_staff', 'created_at']
     search_fields = ['username', 'email', 'first_name', 'last_name']
+    list_select_related = ('role',)
     
-    fieldsets = UserAdmin.fieldsets + (
-        ('Additional Info', {
-            'fields': ('role', 'phone_number', 'address', 'is_active_staff')
-        }),
-        ('Restaurant Info (Owners Only)', {
-            'fields': ('restaurant_name', 'restaurant_description', 'restaurant_qr_code', 'tax_rate', 'owner'),
-            'classes': ('collapse',)
-        }),
-        ('Auto-Print Settings (Owners Only)', {
-            'fields': ('auto_print_kot', 'auto_print_bot'),
-        }),
-        ('Printer Configuration (Owners Only)', {
-            'fields': ('kitchen_printer_name', 'bar_printer_name', 'receipt_printer_name', 'get_available_printers'),
-            'description': 'Configure specific printers for different print jobs. Leave blank to use auto-detected printer.',
-        }),
-        ('Print Client Token', {
-            'fields': ('get_print_token',),
-            'classes': ('collapse',)
-        }),
-    )
-    
-    add_fieldsets = UserAdmin.add_fieldsets + (
-        ('Additional Info', {
-            'fields': ('role', 'phone_number', 'address', 'is_active_staff')
-        }),
-    )
+    # Built once at import from the module-level extras
+    fieldsets = _USER_FIELDSETS
+    add_fieldsets = _USER_ADD_FIELDSETS
     
     readonly_fields = ['get_print_token', 'get_available_printers']
     
-    def has_print_token(self, obj):
-        """Check if user has API token"""
-        if not HAS_REST_FRAMEWORK or Token is None:
+    # REST framework availability is fixed for the life of the process, so pick
+    # the token helpers once here instead of re-checking on every row render.
+    if HAS_REST_FRAMEWORK:
+        def get_queryset(self, request):
+            """Prefetch print tokens so the changelist doesn't query once per row"""
+            return super().get_queryset(request).select_related('role').prefetch_related('auth_token')
+        
+        def has_print_token(self, obj):
+            """Check if user has API token"""
+            return getattr(obj, 'auth_token', None) is not None
+        
+        def get_print_token(self, obj):
+            """Display API token with copy button"""
+            token = getattr(obj, 'auth_token', None)
+            if token is None:
+                return format_html(_NO_TOKEN_HTML_TEMPLATE, obj.username)
+            
+            return format_html(_TOKEN_HTML_TEMPLATE, token.key)
+    else:
+        def get_queryset(self, request):
+            return super().get_queryset(request).select_related('role')
+        
+        def has_print_token(self, obj):
+            """Print tokens need REST framework"""
             return False
-        return Token.objects.filter(user=obj).exists()
+        
+        def get_print_token(self, obj):
+            """Explain that REST framework is required for print tokens"""
+            return _REST_FRAMEWORK_MISSING_HTML
+    
     has_print_token.boolean = True
     has_print_token.short_description = 'Print Token'
-    
-    def get_print_token(self, obj):
-        """Display API token with copy button"""
-        if not HAS_REST_FRAMEWORK or Token is None:
-            return format_html(
-                '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
-                '<strong>REST Framework not installed</strong><br>'
-                '<small>Install: <code>pip install djangorestframework</code></small>'
-                '</div>'
-            )
-        
-        try:
-            token = Token.objects.get(user=obj)
-            return format_html(
-                '<div style="padding: 10px; background: #f0f0f0; border-radius: 5px;">'
-                '<strong>API Token:</strong><br>'
-                '<code style="font-size: 14px; background: white; padding: 5px; display: inline-block; margin: 5px 0;">{}</code><br>'
-                '<small>Use this token in print_client/config.json</small><br>'
-                '<a href="#" onclick="navigator.clipboard.writeText(\'{}\'); alert(\'Token copied!\'); return false;" '
-                'style="display: inline-block; margin-top: 5px; padding: 5px 10px; background: #417690; color: white; '
-                'text-decoration: none; border-radius: 3px;">📋 Copy Token</a>'
-                '</div>',
-                token.key,
-                token.key
-            )
-        except Token.DoesNotExist:
-            return format_html(
-                '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
-                '<strong>No token generated yet</strong><br>'
-                '<small>Run: <code>python manage.py generate_print_token {}</code></small>'
-                '</div>',
-                obj.username
-            )
     get_print_token.short_description = 'Print Client API Token'
     
     def get_available_printers(self, obj):
         """Display list of available printers on the system"""
+        if not _HAS_WIN32PRINT:
+            return _WIN32PRINT_MISSING_HTML
+        
         try:
-            import win32print  # type: ignore
-            printers = []
-            for printer_info in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL):
-                printers.append(printer_info[2])
-            
-            if printers:
-                printer_list = '<br>'.join([f'• {p}' for p in printers])
-                return format_html(
-                    '<div style="padding: 10px; background: #f0f0f0; border-radius: 5px;">'
-                    '<strong>Available Printers:</strong><br>'
-                    '<div style="margin-top: 5px; font-family: monospace; font-size: 12px;">{}</div>'
-                    '<small style="color: #666; margin-top: 5px; display: block;">'
-                    'Copy the exact printer name above and paste it into the printer fields.'
-                    '</small>'
-                    '</div>',
-                    printer_list
-                )
-            else:
-                return format_html(
-                    '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
-                    'No printers found on this system.'
-                    '</div>'
-                )
-        except ImportError:
-            return format_html(
-                '<div style="padding: 10px; background: #fff3cd; border-radius: 5px;">'
-                '<strong>Win32print not available</strong><br>'
-                '<small>Printer detection only works on Windows systems.</small>'
-                '</div>'
-            )
+            printers = get_cached_printers()
         except Exception as e:
-            return format_html(
-                '<div style="padding: 10px; background: #ffcccc; border-radius: 5px;">'
-                '<strong>Error detecting printers:</strong><br>'
-                '<small>{}</small>'
-                '</div>',
-                str(e)
-            )
+            return format_html(_PRINTER_ERROR_HTML_TEMPLATE, str(e))
+        
+        if printers:
+            printer_list = format_html_join(mark_safe('<br>'), '• {}', ((p,) for p in printers))
+            return format_html(_PRINTERS_HTML_TEMPLATE, printer_list)
+        return _NO_PRINTERS_HTML
     get_available_printers.short_description = 'Available Printers on System'
 
 
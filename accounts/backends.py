@@ -0,0 +1,21 @@
+"""
+Authentication backends for the accounts app
+"""
+
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+
+
+class RoleModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the session user with role and owner joined,
+    so role checks and owner lookups later in the request don't each query.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related('role', 'owner').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
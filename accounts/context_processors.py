@@ -0,0 +1,23 @@
+"""
+Template context processors for the accounts app
+"""
+
+from django.utils.functional import SimpleLazyObject
+from django.utils.html import escape
+
+from .templatetags.restaurant_tags import INTEGER_CURRENCIES, build_price_format, get_user_currency_info
+
+
+def currency_ctx(request):
+    """
+    Expose the request's currency as
+    currency_ctx = (currency_code, symbol, use_decimals, price_format),
+    where price_format is an HTML-escaped str.format template such as 'KSh{:,.0f}'.
+    Resolved lazily, so pages that show no prices never pay for the lookup.
+    """
+    def resolve():
+        currency_code, symbol = get_user_currency_info(getattr(request, 'user', None), request)
+        use_decimals = currency_code not in INTEGER_CURRENCIES
+        return currency_code, symbol, use_decimals, build_price_format(escape(symbol), use_decimals)
+    
+    return {'currency_ctx': SimpleLazyObject(resolve)}
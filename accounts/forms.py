@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
 from .models import User
 
 class UserLoginForm(forms.Form):
@@ -89,13 +90,16 @@ class UserRegistrationForm(forms.ModelForm):
     
     def clean(self):
         cleaned_data = super().clean()
-        password = cleaned_data.get('password')
-        confirm_password = cleaned_data.get('confirm_password')
         
-        # Honeypot check - if filled, it's a bot
+        # Honeypot check - if filled, it's a bot (checked before any expensive validation)
         if cleaned_data.get('website'):
             raise forms.ValidationError("Bot detected.")
         
+        self._check_username_email_available(cleaned_data)
+        
+        password = cleaned_data.get('password')
+        confirm_password = cleaned_data.get('confirm_password')
+        
         if password and confirm_password and password != confirm_password:
             raise forms.ValidationError("Passwords don't match.")
         
@@ -108,17 +112,31 @@ class UserRegistrationForm(forms.ModelForm):
         
         return cleaned_data
     
-    def clean_username(self):
-        username = self.cleaned_data['username']
-        if User.objects.filter(username=username).exists():
-            raise forms.ValidationError("A user with this username already exists.")
-        return username
+    def _get_validation_exclusions(self):
+        # Username uniqueness is already checked in clean(), together with email;
+        # skip the model's own username lookup in validate_unique()
+        exclude = super()._get_validation_exclusions()
+        exclude.add('username')
+        return exclude
     
-    def clean_email(self):
-        email = self.cleaned_data['email']
-        if User.objects.filter(email=email).exists():
-            raise forms.ValidationError("A user with this email already exists.")
-        return email
+    def _check_username_email_available(self, cleaned_data):
+        """Check username and email uniqueness with a single query"""
+        username = cleaned_data.get('username')
+        email = cleaned_data.get('email')
+        
+        lookup = Q()
+        if username:
+            lookup |= Q(username=username)
+        if email:
+            lookup |= Q(email=email)
+        if not lookup:
+            return
+        
+        conflicts = list(User.objects.filter(lookup).values_list('username', 'email'))
+        if username and any(existing_username == username for existing_username, _ in conflicts):
+            self.add_error('username', "A user with this username already exists.")
+        if email and any(existing_email == email for _, existing_email in conflicts):
+            self.add_error('email', "A user with this email already exists.")
 
 
 class OwnerRegistrationForm(forms.ModelForm):
@@ -300,13 +318,14 @@ class CustomerRegistrationForm(forms.ModelForm):
 
     def clean(self):
         cleaned_data = super().clean()
-        password = cleaned_data.get('password')
-        confirm_password = cleaned_data.get('confirm_password')
         
-        # Honeypot check - if filled, it's a bot
+        # Honeypot check - if filled, it's a bot (checked before any expensive validation)
         if cleaned_data.get('website'):
             raise forms.ValidationError("Bot detected.")
         
+        password = cleaned_data.get('password')
+        confirm_password = cleaned_data.get('confirm_password')
+        
         if password and confirm_password and password != confirm_password:
             raise forms.ValidationError("Passwords don't match.")
         
@@ -21,16 +21,15 @@ class Command(BaseCommand):
             }
         ]
         
-        created_count = 0
+        # One query for every existing role; reused for the final listing
+        existing_roles = {role.name: role for role in Role.objects.all()}
         
+        to_create = []
         for role_data in roles_to_create:
-            role, created = Role.objects.get_or_create(
-                name=role_data['name'],
-                defaults={'description': role_data['description']}
-            )
-            
-            if created:
-                created_count += 1
+            role = existing_roles.get(role_data['name'])
+            if role is None:
+                role = Role(**role_data)
+                to_create.append(role)
                 self.stdout.write(
                     self.style.SUCCESS(f'✓ Created role: {role.get_name_display()}')
                 )
@@ -39,11 +38,16 @@ class Command(BaseCommand):
                     self.style.WARNING(f'• Role already exists: {role.get_name_display()}')
                 )
         
+        Role.objects.bulk_create(to_create, ignore_conflicts=True)
+        existing_roles.update((role.name, role) for role in to_create)
+        created_count = len(to_create)
+        
         self.stdout.write('')
         self.stdout.write(
             self.style.SUCCESS(f'✓ Process complete. Created {created_count} new roles.')
         )
         self.stdout.write('')
         self.stdout.write('Available roles:')
-        for role in Role.objects.all().order_by('name'):
-            self.stdout.write(f'  • {role.get_name_display()} - {role.description}')
\ No newline at end of file
+        for name in sorted(existing_roles):
+            role = existing_roles[name]
+            self.stdout.write(f'  • {role.get_name_display()} - {role.description}')
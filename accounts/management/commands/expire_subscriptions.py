@@ -0,0 +1,19 @@
+"""
+Management command to expire subscriptions past their grace period
+
+Usage (daily cron):
+    python manage.py expire_subscriptions
+"""
+
+from django.core.management.base import BaseCommand
+from accounts.models import RestaurantSubscription
+
+
+class Command(BaseCommand):
+    help = 'Expire subscriptions past their grace period and block their restaurants'
+
+    def handle(self, *args, **options):
+        expired_count = RestaurantSubscription.sweep_expired()
+        self.stdout.write(
+            self.style.SUCCESS(f'Expired {expired_count} subscription(s)')
+        )
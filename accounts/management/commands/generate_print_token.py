@@ -8,6 +8,7 @@ Usage:
 
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 
 User = get_user_model()
@@ -47,9 +48,14 @@ class Command(BaseCommand):
 
         # Get or create token
         if regenerate:
-            # Delete old token and create new one
-            Token.objects.filter(user=user).delete()
-            token = Token.objects.create(user=user)
+            # Swap the key in place with a single UPDATE so the user is never
+            # left without a token. The key is Token's primary key, so this
+            # can't go through update_or_create()/save().
+            new_key = Token.generate_key()
+            if Token.objects.filter(user=user).update(key=new_key, created=timezone.now()):
+                token = Token(key=new_key, user=user)
+            else:
+                token = Token.objects.create(user=user, key=new_key)
             self.stdout.write(
                 self.style.SUCCESS(f'✓ Token regenerated for user "{username}"')
             )
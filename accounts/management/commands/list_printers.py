@@ -5,24 +5,49 @@ Usage:
     python manage.py list_printers
 """
 
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
 import sys
 
+from accounts.admin import AVAILABLE_PRINTERS_CACHE_KEY
+
+try:
+    import win32print  # type: ignore
+    _HAS_WIN32PRINT = True
+except ImportError:
+    win32print = None
+    _HAS_WIN32PRINT = False
+
 
 class Command(BaseCommand):
     help = 'List all available printers on this system'
 
     def handle(self, *args, **options):
+        if not _HAS_WIN32PRINT:
+            self.stdout.write(self.style.ERROR('Error: win32print module not available'))
+            self.stdout.write('')
+            self.stdout.write('This command only works on Windows systems.')
+            self.stdout.write('Install pywin32: pip install pywin32')
+            sys.exit(1)
+        
         try:
-            import win32print  # type: ignore
-            
             self.stdout.write('=' * 70)
             self.stdout.write(self.style.SUCCESS('Available Printers on This System:'))
             self.stdout.write('=' * 70)
             
-            printers = []
-            for printer_info in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL):
-                printers.append(printer_info[2])
+            # Default printer is a cheap registry lookup; fetch it once up front
+            try:
+                default_printer = win32print.GetDefaultPrinter()
+            except Exception:
+                default_printer = None
+            
+            printers = [
+                printer_info[2]
+                for printer_info in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL)
+            ]
+            
+            # Printers were just enumerated, so drop the admin's cached list
+            cache.delete(AVAILABLE_PRINTERS_CACHE_KEY)
             
             if not printers:
                 self.stdout.write(self.style.WARNING('No printers found!'))
@@ -33,16 +58,11 @@ class Command(BaseCommand):
                 self.stdout.write('  3. This is a Windows system')
                 return
             
-            # Get default printer
-            try:
-                default_printer = win32print.GetDefaultPrinter()
-            except Exception:
-                default_printer = None
-            
             # Display printers
-            for i, printer in enumerate(printers, 1):
-                is_default = ' (DEFAULT)' if printer == default_printer else ''
-                self.stdout.write(f'{i}. {printer}{is_default}')
+            self.stdout.write('\n'.join(
+                f'{i}. {printer}{" (DEFAULT)" if printer == default_printer else ""}'
+                for i, printer in enumerate(printers, 1)
+            ))
             
             self.stdout.write('')
             self.stdout.write('=' * 70)
@@ -60,13 +80,6 @@ class Command(BaseCommand):
             self.stdout.write('')
             self.stdout.write(self.style.SUCCESS('✓ Configuration saved!'))
             
-        except ImportError:
-            self.stdout.write(self.style.ERROR('Error: win32print module not available'))
-            self.stdout.write('')
-            self.stdout.write('This command only works on Windows systems.')
-            self.stdout.write('Install pywin32: pip install pywin32')
-            sys.exit(1)
-            
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
             sys.exit(1)
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:29
+
+import accounts.models
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_role_name(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Role = apps.get_model('accounts', 'Role')
+    User.objects.filter(role__isnull=False).update(
+        role_name=Subquery(Role.objects.filter(pk=OuterRef('role_id')).values('name')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_auditlog'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', accounts.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='role_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(populate_role_name, migrations.RunPython.noop),
+    ]
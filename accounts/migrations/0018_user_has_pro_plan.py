@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:30
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def populate_has_pro_plan(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Restaurant = apps.get_model('restaurant', 'Restaurant')
+    User.objects.update(
+        has_pro_plan=Exists(
+            Restaurant.objects.filter(
+                main_owner_id=OuterRef('pk'),
+                is_main_restaurant=True,
+                subscription_plan='PRO',
+            )
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_user_role_name'),
+        ('restaurant', '0010_add_subscription_plan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='has_pro_plan',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(populate_has_pro_plan, migrations.RunPython.noop),
+    ]
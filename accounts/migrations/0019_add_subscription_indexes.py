@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_user_has_pro_plan'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantsubscription',
+            index=models.Index(fields=['subscription_end_date', 'subscription_status'], name='subscription_end_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantsubscription',
+            index=models.Index(fields=['is_blocked_by_admin', 'subscription_status'], name='subscription_blocked_idx'),
+        ),
+    ]
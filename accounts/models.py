@@ -1,9 +1,45 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.apps import apps
+from django.contrib.auth.models import AbstractUser, UserManager as AuthUserManager
+from django.db import models, transaction
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from decimal import Decimal
+from collections import namedtuple
+from functools import lru_cache
 from datetime import date, timedelta
+import secrets
+
+
+# Role names that own a restaurant (legacy 'owner' plus the hierarchical roles)
+_OWNER_ROLES = frozenset({'owner', 'main_owner', 'branch_owner'})
+# Staff role names; staff get their restaurant from User.owner
+_STAFF_ROLES = frozenset({'customer_care', 'kitchen', 'bar', 'buffet', 'service', 'cashier'})
+
+# restaurant.models_restaurant imports this module, so Restaurant is resolved
+# lazily through the app registry and cached after the first lookup
+_Restaurant = None
+
+
+def _restaurant_model():
+    global _Restaurant
+    if _Restaurant is None:
+        _Restaurant = apps.get_model('restaurant', 'Restaurant')
+    return _Restaurant
+
+
+# QR code -> restaurant/subscription data resolved by the QR access views
+QR_ACCESS_CACHE_KEY = 'qr_access:{}'
+QR_ACCESS_CACHE_TIMEOUT = 600  # seconds
+
+# Currencies that are displayed without decimal places
+_INTEGER_CURRENCIES = frozenset({'KES', 'TZS', 'UGX', 'RWF', 'JPY'})
+
+# Tax rate used when a user has no owner, and the percentage scale factor
+_DEFAULT_TAX_RATE = Decimal('0.0800')
+_TAX_HUNDRED = Decimal(100)
 
 
 def get_owner_filter(user):
@@ -29,7 +65,10 @@ def check_owner_permission(user, obj):
     if user.is_administrator():
         return True
     
-    obj_owner = obj.owner if hasattr(obj, 'owner') else obj.get_owner()
+    try:
+        obj_owner = obj.owner
+    except AttributeError:
+        obj_owner = obj.get_owner()
     user_owner = get_owner_filter(user)
     
     return obj_owner == user_owner
@@ -56,8 +95,43 @@ class Role(models.Model):
     def __str__(self):
         return self.get_name_display()
 
+
+@lru_cache(maxsize=16)
+def get_role(name, description=''):
+    """Role by name, created on first use. Cached per process; cleared when roles change."""
+    role, _ = Role.objects.get_or_create(name=name, defaults={'description': description})
+    return role
+
+
+@receiver([post_save, post_delete], sender=Role)
+def clear_role_cache(sender, **kwargs):
+    get_role.cache_clear()
+
+
+class UserManager(AuthUserManager):
+    """Default user manager - always joins the role, which nearly every view reads"""
+    
+    def get_queryset(self):
+        return super().get_queryset().select_related('role')
+    
+    def restaurant_members(self, owner_id):
+        """
+        The owner plus every user under them, narrowed to the activation columns.
+        Used for bulk activate/deactivate, so no role join and no wide rows.
+        """
+        return super().get_queryset().filter(
+            models.Q(pk=owner_id) | models.Q(owner_id=owner_id)
+        ).only('id', 'is_active')
+
+
 class User(AbstractUser):
     role = models.ForeignKey(Role, on_delete=models.CASCADE, null=True, blank=True)
+    # Denormalized copy of role.name so the is_*() helpers never touch the Role FK.
+    # Kept in sync by save() and the Role post_save handler below.
+    role_name = models.CharField(max_length=20, blank=True, default='', db_index=True, editable=False)
+    # Denormalized from the main restaurant's subscription_plan for has_pro_plan_access().
+    # Kept in sync by the Restaurant post_save/post_delete handlers.
+    has_pro_plan = models.BooleanField(default=False, db_index=True, editable=False)
     # Owner relationship - customers and staff belong to an owner
     owner = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, 
                              related_name='owned_users', limit_choices_to={'role__name': 'owner'})
@@ -70,7 +144,7 @@ class User(AbstractUser):
     restaurant_qr_code = models.CharField(max_length=50, unique=True, blank=True, null=True,
                                         help_text="Unique QR code for restaurant access")
     # Tax configuration for restaurant owners
-    tax_rate = models.DecimalField(max_digits=5, decimal_places=4, default=Decimal('0.0800'), 
+    tax_rate = models.DecimalField(max_digits=5, decimal_places=4, default=_DEFAULT_TAX_RATE, 
                                  help_text="Tax rate as decimal (e.g., 0.0800 for 8%, 0.0500 for 5%)")
     
     # Currency configuration for restaurant owners
@@ -109,6 +183,18 @@ class User(AbstractUser):
         'CNY': '¥',
         'JPY': '¥',
     }
+    # Bound once so symbol lookups skip the instance -> class -> dict attribute walk
+    _CURRENCY_SYMBOL_GET = CURRENCY_SYMBOLS.get
+    # (symbol, is_integer) per currency so format_currency needs a single lookup
+    _CURRENCY_INFO = {
+        code: (symbol, code in _INTEGER_CURRENCIES)
+        for code, symbol in CURRENCY_SYMBOLS.items()
+    }
+    # Prebuilt str.format templates, e.g. 'KSh{:,.0f}' / '€{:,.2f}'
+    _CURRENCY_FORMATTERS = {
+        code: symbol + ('{:,.0f}' if is_integer else '{:,.2f}')
+        for code, (symbol, is_integer) in _CURRENCY_INFO.items()
+    }
     
     currency_code = models.CharField(
         max_length=3, 
@@ -145,67 +231,78 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserManager()
+    
     def __str__(self):
         if self.is_owner():
             return f"{self.username} - {self.role.name if self.role else 'No Role'} ({self.restaurant_name or 'No Restaurant'})"
         return f"{self.username} - {self.role.name if self.role else 'No Role'}"
     
     def is_administrator(self):
-        return self.role and self.role.name == 'administrator'
+        return self.role_name == 'administrator'
     
     def is_main_owner(self):
-        return self.role and self.role.name == 'main_owner'
+        return self.role_name == 'main_owner'
     
     def is_branch_owner(self):
-        return self.role and self.role.name == 'branch_owner'
+        return self.role_name == 'branch_owner'
     
     def is_owner(self):
         """Legacy method - includes main_owner, branch_owner, and old 'owner' role"""
-        return self.role and self.role.name in ['owner', 'main_owner', 'branch_owner']
+        return self.role_name in _OWNER_ROLES
     
     def is_any_owner(self):
         """Check if user has any type of ownership role"""
-        return self.is_main_owner() or self.is_branch_owner() or (self.role and self.role.name == 'owner')
+        return self.role_name in _OWNER_ROLES
     
     def is_customer_care(self):
-        return self.role and self.role.name == 'customer_care'
+        return self.role_name == 'customer_care'
     
     def is_kitchen_staff(self):
-        return self.role and self.role.name == 'kitchen'
+        return self.role_name == 'kitchen'
     
     def is_bar_staff(self):
-        return self.role and self.role.name == 'bar'
+        return self.role_name == 'bar'
     
     def is_buffet_staff(self):
-        return self.role and self.role.name == 'buffet'
+        return self.role_name == 'buffet'
     
     def is_service_staff(self):
-        return self.role and self.role.name == 'service'
+        return self.role_name == 'service'
     
     def is_cashier(self):
-        return self.role and self.role.name == 'cashier'
+        return self.role_name == 'cashier'
+    
+    def is_restaurant_staff(self):
+        """Any staff role (customer care, kitchen, bar, buffet, service, cashier)"""
+        return self.role_name in _STAFF_ROLES
     
     def is_customer(self):
-        return self.role and self.role.name == 'customer'
+        return self.role_name == 'customer'
     
     def get_owner(self):
-        """Get the owner this user belongs to"""
-        if self.is_any_owner():
-            return self
-        return self.owner
+        """Get the owner this user belongs to (memoized on the instance)"""
+        # Keyed on the fields it depends on so reassigning role/owner can't go stale
+        key = (self.role_name, self.owner_id)
+        cached = self.__dict__.get('_owner_cache')
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        owner = self if self.role_name in _OWNER_ROLES else self.owner
+        self._owner_cache = (key, owner)
+        return owner
     
     def get_accessible_restaurants(self):
         """Get restaurants this user can access"""
-        from restaurant.models_restaurant import Restaurant
-        return Restaurant.get_accessible_restaurants(self)
+        return _restaurant_model().get_accessible_restaurants(self)
     
     def get_current_restaurant(self, request=None):
         """Get current restaurant from session or default"""
         if request and hasattr(request, 'session'):
             restaurant_id = request.session.get('selected_restaurant_id')
             if restaurant_id:
+                Restaurant = _restaurant_model()
                 try:
-                    from restaurant.models_restaurant import Restaurant
                     restaurant = Restaurant.objects.get(id=restaurant_id)
                     if restaurant.can_user_access(self):
                         return restaurant
@@ -222,22 +319,8 @@ class User(AbstractUser):
     
     def has_pro_plan_access(self):
         """Check if user has PRO plan access for branch features"""
-        if not self.is_main_owner():
-            return False
-        
-        from restaurant.models_restaurant import Restaurant
-        try:
-            # Get the main restaurant for this user
-            main_restaurant = Restaurant.objects.filter(
-                main_owner=self,
-                is_main_restaurant=True
-            ).first()
-            
-            if main_restaurant:
-                return main_restaurant.subscription_plan == 'PRO'
-            return False
-        except Exception:
-            return False
+        # has_pro_plan mirrors the main restaurant's plan (synced on Restaurant save)
+        return self.is_main_owner() and self.has_pro_plan
     
     def can_access_branch_features(self):
         """Check if user can access branch network features (requires PRO plan)"""
@@ -245,7 +328,7 @@ class User(AbstractUser):
     
     def get_managed_restaurants(self):
         """Get restaurants directly managed by this user"""
-        from restaurant.models_restaurant import Restaurant
+        Restaurant = _restaurant_model()
         if self.is_main_owner():
             return Restaurant.objects.filter(main_owner=self)
         elif self.is_branch_owner():
@@ -260,57 +343,52 @@ class User(AbstractUser):
     
     def get_user_restaurant_info(self):
         """Get the restaurant this user belongs to with type (Main/Branch)"""
-        try:
-            from restaurant.models_restaurant import Restaurant
-            
-            # Check if user is branch owner (check this FIRST to avoid wrong assignment)
-            branch_restaurant = Restaurant.objects.filter(branch_owner=self, is_main_restaurant=False).first()
-            if branch_restaurant:
-                return {
-                    'restaurant': branch_restaurant,
-                    'name': branch_restaurant.name,
-                    'type': 'Branch',
-                    'is_main': False,
-                    'parent_name': branch_restaurant.parent_restaurant.name if branch_restaurant.parent_restaurant else None
-                }
-            
-            # Check if user is main owner (only for main restaurants)
-            main_restaurant = Restaurant.objects.filter(main_owner=self, is_main_restaurant=True).first()
-            if main_restaurant:
-                return {
-                    'restaurant': main_restaurant,
-                    'name': main_restaurant.name,
-                    'type': 'Main',
-                    'is_main': True
-                }
-            
-            # Check if user is staff under an owner
-            if self.owner:
-                # Check if owner is a branch owner first
-                branch_restaurant = Restaurant.objects.filter(branch_owner=self.owner, is_main_restaurant=False).first()
-                if branch_restaurant:
-                    return {
-                        'restaurant': branch_restaurant,
-                        'name': branch_restaurant.name,
-                        'type': 'Branch',
-                        'is_main': False,
-                        'parent_name': branch_restaurant.parent_restaurant.name if branch_restaurant.parent_restaurant else None
-                    }
-                
-                # Staff under main owner
-                main_restaurant = Restaurant.objects.filter(main_owner=self.owner, is_main_restaurant=True).first()
-                if main_restaurant:
-                    return {
-                        'restaurant': main_restaurant,
-                        'name': main_restaurant.name,
-                        'type': 'Main',
-                        'is_main': True
-                    }
-            
-            return None
-        except Exception as e:
+        Restaurant = _restaurant_model()
+        
+        # Candidates in priority order: the user's own branch, the user's own main
+        # restaurant, then (for staff) the owner's branch and the owner's main restaurant.
+        # Branch ownership is checked FIRST to avoid wrong assignment.
+        owners = [self.pk]
+        if self.owner_id:
+            owners.append(self.owner_id)
+        
+        candidates = Restaurant.objects.filter(
+            models.Q(branch_owner_id__in=owners, is_main_restaurant=False) |
+            models.Q(main_owner_id__in=owners, is_main_restaurant=True)
+        ).select_related('parent_restaurant').only(
+            'name', 'is_main_restaurant', 'main_owner_id', 'branch_owner_id',
+            'parent_restaurant__name'
+        )
+        
+        best = None
+        best_rank = None
+        for restaurant in candidates:
+            if restaurant.is_main_restaurant:
+                owner_rank = owners.index(restaurant.main_owner_id)
+            else:
+                owner_rank = owners.index(restaurant.branch_owner_id)
+            rank = (owner_rank, restaurant.is_main_restaurant)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = restaurant, rank
+        
+        if best is None:
             return None
-    
+        
+        if best.is_main_restaurant:
+            return {
+                'restaurant': best,
+                'name': best.name,
+                'type': 'Main',
+                'is_main': True
+            }
+        return {
+            'restaurant': best,
+            'name': best.name,
+            'type': 'Branch',
+            'is_main': False,
+            'parent_name': best.parent_restaurant.name if best.parent_restaurant else None
+        }
+
     def get_restaurant_name(self, request=None):
         """Get the restaurant name for this user's owner or current session restaurant"""
         if self.is_customer():
@@ -336,8 +414,7 @@ class User(AbstractUser):
         if owner.is_branch_owner() or (hasattr(self, 'is_branch_owner') and self.is_branch_owner()):
             # Get the main restaurant for this branch owner
             try:
-                from restaurant.models_restaurant import Restaurant
-                branch_restaurant = Restaurant.objects.filter(
+                branch_restaurant = _restaurant_model().objects.filter(
                     branch_owner=owner,
                     is_main_restaurant=False
                 ).first()
@@ -357,17 +434,17 @@ class User(AbstractUser):
     def get_tax_rate(self):
         """Get the tax rate for this user's restaurant owner"""
         owner = self.get_owner()
-        return owner.tax_rate if owner else Decimal('0.0800')
+        return owner.tax_rate if owner else _DEFAULT_TAX_RATE
     
     def get_tax_rate_percentage(self):
         """Get the tax rate as percentage for display (e.g., 8.0 for 8%)"""
-        return float(self.get_tax_rate() * 100)
+        return float(self.get_tax_rate() * _TAX_HUNDRED)
     
     def get_currency_symbol(self):
         """Get the currency symbol for this user's restaurant"""
         owner = self.get_owner()
         if owner:
-            return self.CURRENCY_SYMBOLS.get(owner.currency_code, '$')
+            return User._CURRENCY_SYMBOL_GET(owner.currency_code, '$')
         return '$'
     
     def get_currency_code(self):
@@ -379,21 +456,18 @@ class User(AbstractUser):
     
     def format_currency(self, amount):
         """Format an amount with the correct currency symbol"""
-        symbol = self.get_currency_symbol()
+        # Resolve the owner's currency once rather than per helper call
+        code = self.get_currency_code()
         try:
-            amount = float(amount)
-            # For currencies that typically use integer values (like KES, TZS)
-            if self.get_currency_code() in ['KES', 'TZS', 'UGX', 'RWF', 'JPY']:
-                return f"{symbol}{amount:,.0f}"
-            return f"{symbol}{amount:,.2f}"
+            # Integer-style currencies (like KES, TZS) use a no-decimals template
+            return User._CURRENCY_FORMATTERS.get(code, '${:,.2f}').format(float(amount))
         except (TypeError, ValueError):
-            return f"{symbol}0.00"
+            return f"{User._CURRENCY_SYMBOL_GET(code, '$')}0.00"
     
     def generate_qr_code(self):
         """Generate unique QR code for restaurant"""
-        import uuid
         if self.is_owner() and not self.restaurant_qr_code:
-            self.restaurant_qr_code = f"REST-{uuid.uuid4().hex[:12].upper()}"
+            self.restaurant_qr_code = f"REST-{secrets.token_hex(6).upper()}"
             return self.restaurant_qr_code
         return self.restaurant_qr_code
     
@@ -409,12 +483,30 @@ class User(AbstractUser):
         return None
     
     def save(self, *args, **kwargs):
+        # Fields normalized below, added to a narrow UPDATE only when they change
+        derived_fields = set()
+        
+        # Keep the denormalized role name in step with the role FK
+        role_name = self.role.name if self.role_id else ''
+        if role_name != self.role_name:
+            self.role_name = role_name
+            derived_fields.add('role_name')
+        
         # Owners don't have an owner (they are the owner)
         if self.is_owner():
-            self.owner = None
-            # Generate QR code if not exists
+            if self.owner_id is not None:
+                self.owner = None
+                derived_fields.add('owner')
+            # Generate QR code if not exists; only then does the code need writing,
+            # so e.g. update_fields=['last_login'] stays clear of QR cache purges
             if not self.restaurant_qr_code:
                 self.generate_qr_code()
+                derived_fields.add('restaurant_qr_code')
+        
+        # A narrow UPDATE must still persist the fields normalized above
+        update_fields = kwargs.get('update_fields')
+        if update_fields and derived_fields and not self._state.adding:
+            kwargs['update_fields'] = derived_fields.union(update_fields)
         super().save(*args, **kwargs)
     
     class Meta:
@@ -426,6 +518,101 @@ class User(AbstractUser):
         ]
 
 
+@receiver(post_save, sender=Role)
+def sync_user_role_names(sender, instance, created, **kwargs):
+    """Propagate a renamed role to the denormalized User.role_name column"""
+    if created:
+        return
+    User.objects.filter(role=instance).exclude(role_name=instance.name).update(role_name=instance.name)
+
+
+def clear_qr_access_cache(owner_ids):
+    """
+    Drop the cached QR resolution of every code that leads to these owners:
+    their restaurants (branches included, since they check the main owner's
+    subscription) and the legacy per-owner codes of those restaurants' owners.
+    """
+    owner_ids = set(owner_ids) - {None}
+    if not owner_ids:
+        return
+    codes = set()
+    for qr_code, branch_owner_id in _restaurant_model().objects.filter(
+        models.Q(main_owner_id__in=owner_ids) | models.Q(branch_owner_id__in=owner_ids)
+    ).values_list('qr_code', 'branch_owner_id'):
+        codes.add(qr_code)
+        owner_ids.add(branch_owner_id)
+    codes.update(User.objects.filter(
+        pk__in=owner_ids - {None}, restaurant_qr_code__isnull=False
+    ).values_list('restaurant_qr_code', flat=True))
+    cache.delete_many([QR_ACCESS_CACHE_KEY.format(qr_code) for qr_code in codes if qr_code])
+
+
+# Owner columns a cached QR resolution depends on
+_QR_ACCESS_USER_FIELDS = frozenset({
+    'is_active', 'restaurant_name', 'restaurant_description', 'address',
+    'phone_number', 'email', 'restaurant_qr_code',
+})
+
+
+@receiver([post_save, post_delete], sender=User)
+def clear_owner_qr_access_cache(sender, instance, update_fields=None, **kwargs):
+    """Owner details and active flag are part of the cached QR resolution"""
+    if instance.role_name not in _OWNER_ROLES:
+        return
+    # e.g. last_login on every sign-in doesn't touch the cached data
+    if update_fields is not None and not _QR_ACCESS_USER_FIELDS.intersection(update_fields):
+        return
+    if instance.restaurant_qr_code:
+        # A deleted owner's own code can't be found through the lookups below
+        cache.delete(QR_ACCESS_CACHE_KEY.format(instance.restaurant_qr_code))
+    clear_qr_access_cache([instance.pk])
+
+
+# Date-derived subscription flags, computed together by RestaurantSubscription._compute_state()
+_SubscriptionState = namedtuple(
+    '_SubscriptionState', ['is_active', 'is_grace', 'days_to_expire', 'days_in_grace', 'grace_end']
+)
+
+
+class _AddDays(models.Func):
+    """date + integer days; PostgreSQL does this natively, SQLite needs date()"""
+    arg_joiner = ' + '
+    template = '(%(expressions)s)'
+    output_field = models.DateField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="date(%(expressions)s || ' days')", arg_joiner=", '+' || ",
+            **extra_context
+        )
+
+
+class RestaurantSubscriptionQuerySet(models.QuerySet):
+    """Subscription queries that evaluate the period checks in the database"""
+
+    def with_period_end(self):
+        """Annotate period_end: the last day of the grace period"""
+        return self.annotate(
+            period_end=_AddDays('subscription_end_date', 'grace_period_days')
+        )
+
+    def with_period_valid(self, today=None):
+        """
+        Annotate period_valid, the SQL form of is_subscription_period_valid(),
+        so callers can filter(period_valid=True) instead of looping in Python
+        """
+        today = today or date.today()
+        return self.with_period_end().annotate(
+            period_valid=models.ExpressionWrapper(
+                models.Q(subscription_start_date__lte=today) &
+                models.Q(period_end__gte=today) &
+                models.Q(subscription_status__in=['active', 'blocked']),
+                output_field=models.BooleanField()
+            )
+        )
+
+
 class RestaurantSubscription(models.Model):
     """
     SaaS Subscription Management Model
@@ -536,68 +723,73 @@ class RestaurantSubscription(models.Model):
         related_name='created_subscriptions',
         limit_choices_to={'role__name': 'administrator'}
     )
-    
+
+    objects = RestaurantSubscriptionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Restaurant Subscription"
         verbose_name_plural = "Restaurant Subscriptions"
         ordering = ['-created_at']
+        indexes = [
+            # Daily expiration sweep filters on end date + status
+            models.Index(fields=['subscription_end_date', 'subscription_status'], name='subscription_end_status_idx'),
+            models.Index(fields=['is_blocked_by_admin', 'subscription_status'], name='subscription_blocked_idx'),
+        ]
     
     def __str__(self):
         restaurant_name = self.restaurant_owner.restaurant_name or self.restaurant_owner.username
         return f"{restaurant_name} - {self.subscription_plan} ({self.subscription_status})"
     
-    @property
-    def is_active(self):
-        """Check if subscription is currently active"""
-        today = date.today()
-        
-        # Check if blocked by admin
-        if self.is_blocked_by_admin:
-            return False
+    def _compute_state(self, today=None):
+        """
+        Compute every date-derived subscription flag in one pass.
+        Cached on the instance; the key covers every input so edits invalidate it.
+        """
+        today = today or date.today()
+        key = (today, self.subscription_start_date, self.subscription_end_date,
+               self.grace_period_days, self.subscription_status, self.is_blocked_by_admin)
+        cached = self.__dict__.get('_state_cache')
+        if cached is not None and cached[0] == key:
+            return cached[1]
         
-        # Check if status is active
-        if self.subscription_status != 'active':
-            return False
+        end_date = self.subscription_end_date
+        grace_end_date = end_date + timedelta(days=self.grace_period_days)
+        status_active = self.subscription_status == 'active' and not self.is_blocked_by_admin
         
-        # Check if within subscription period
-        if today < self.subscription_start_date:
-            return False
-        
-        # Check if expired (considering grace period)
-        grace_end_date = self.subscription_end_date + timedelta(days=self.grace_period_days)
-        if today > grace_end_date:
-            return False
+        # Active: not blocked, status active, started, and not past the grace period
+        is_active = status_active and self.subscription_start_date <= today <= grace_end_date
+        # Grace period: past the end date but still within the grace window
+        is_grace = status_active and end_date < today <= grace_end_date
         
-        return True
+        state = _SubscriptionState(
+            is_active=is_active,
+            is_grace=is_grace,
+            days_to_expire=(end_date - today).days,
+            days_in_grace=(grace_end_date - today).days if is_grace else 0,
+            grace_end=grace_end_date,
+        )
+        self._state_cache = (key, state)
+        return state
+    
+    @property
+    def is_active(self):
+        """Check if subscription is currently active"""
+        return self._compute_state().is_active
     
     @property
     def is_in_grace_period(self):
         """Check if subscription is in grace period after expiration"""
-        today = date.today()
-        grace_end_date = self.subscription_end_date + timedelta(days=self.grace_period_days)
-        
-        return (
-            today > self.subscription_end_date and 
-            today <= grace_end_date and 
-            self.subscription_status == 'active' and
-            not self.is_blocked_by_admin
-        )
+        return self._compute_state().is_grace
     
     @property
     def days_until_expiration(self):
         """Get number of days until subscription expires (negative if overdue)"""
-        today = date.today()
-        return (self.subscription_end_date - today).days
+        return self._compute_state().days_to_expire
     
     @property
     def days_in_grace_period(self):
         """Get number of days remaining in grace period"""
-        if not self.is_in_grace_period:
-            return 0
-        
-        today = date.today()
-        grace_end_date = self.subscription_end_date + timedelta(days=self.grace_period_days)
-        return (grace_end_date - today).days
+        return self._compute_state().days_in_grace
     
     def extend_subscription(self, days=30, extend_by_admin=False):
         """Extend subscription by specified days"""
@@ -613,31 +805,36 @@ class RestaurantSubscription(models.Model):
         
         self.save()
     
+    def _set_restaurant_users_active(self, is_active):
+        """Activate/deactivate the owner and all staff under them in one UPDATE"""
+        User.objects.restaurant_members(self.restaurant_owner_id).update(is_active=is_active)
+        # Keep the already-loaded owner instance consistent with the database
+        if 'restaurant_owner' in self._state.fields_cache:
+            self.restaurant_owner.is_active = is_active
+    
     def block_restaurant(self, reason="Blocked by administrator", blocked_by=None):
         """Block restaurant access"""
+        old_status = self.subscription_status
+        
         self.is_blocked_by_admin = True
         self.block_reason = reason
         self.subscription_status = 'blocked'
         
-        # Block all related users
-        self.restaurant_owner.is_active = False
-        self.restaurant_owner.save()
-        
-        # Block all staff under this owner
-        staff_users = self.restaurant_owner.owned_users.all()
-        staff_users.update(is_active=False)
-        
-        self.save()
-        
-        # Log the action
-        SubscriptionLog.objects.create(
-            subscription=self,
-            action='blocked',
-            description=f"Restaurant blocked: {reason}",
-            old_status=self.subscription_status,
-            new_status='blocked',
-            performed_by=blocked_by
-        )
+        with transaction.atomic():
+            # Block the owner and all staff under this owner
+            self._set_restaurant_users_active(False)
+            
+            self.save()
+            
+            # Log the action
+            SubscriptionLog.objects.create(
+                subscription=self,
+                action='blocked',
+                description=f"Restaurant blocked: {reason}",
+                old_status=old_status,
+                new_status='blocked',
+                performed_by=blocked_by
+            )
     
     def unblock_restaurant(self, unblocked_by=None):
         """Unblock restaurant access"""
@@ -651,31 +848,26 @@ class RestaurantSubscription(models.Model):
         if self.is_subscription_period_valid():
             self.subscription_status = 'active'
         
-        # Always reactivate users when admin unblocks (admin override)
-        # Unblock owner
-        self.restaurant_owner.is_active = True
-        self.restaurant_owner.save()
-        
-        # Unblock all staff under this owner
-        staff_users = self.restaurant_owner.owned_users.all()
-        staff_users.update(is_active=True)
-        
-        self.save()
-        
-        # Log the action
-        SubscriptionLog.objects.create(
-            subscription=self,
-            action='unblocked',
-            description="Restaurant unblocked by administrator",
-            old_status=old_status,
-            new_status=self.subscription_status,
-            performed_by=unblocked_by
-        )
+        with transaction.atomic():
+            # Always reactivate the owner and staff when admin unblocks (admin override)
+            self._set_restaurant_users_active(True)
+            
+            self.save()
+            
+            # Log the action
+            SubscriptionLog.objects.create(
+                subscription=self,
+                action='unblocked',
+                description="Restaurant unblocked by administrator",
+                old_status=old_status,
+                new_status=self.subscription_status,
+                performed_by=unblocked_by
+            )
     
     def is_subscription_period_valid(self):
         """Check if subscription period is valid (ignoring block status)"""
         today = date.today()
-        grace_end_date = self.subscription_end_date + timedelta(days=self.grace_period_days)
+        grace_end_date = self._compute_state(today).grace_end
         
         return (
             self.subscription_start_date <= today <= grace_end_date and
@@ -703,28 +895,71 @@ class RestaurantSubscription(models.Model):
             if today > grace_end_date:
                 # Fully expired, block access
                 self.subscription_status = 'expired'
-                self.restaurant_owner.is_active = False
-                self.restaurant_owner.save()
-                
-                # Block all staff
-                staff_users = self.restaurant_owner.owned_users.all()
-                staff_users.update(is_active=False)
                 
-                self.save()
-                
-                # Log the expiration
-                SubscriptionLog.objects.create(
-                    subscription=self,
+                with transaction.atomic():
+                    # Block the owner and all staff
+                    self._set_restaurant_users_active(False)
+                    
+                    self.save()
+                    
+                    # Log the expiration
+                    SubscriptionLog.objects.create(
+                        subscription=self,
+                        action='expired',
+                        description="Subscription expired and access blocked",
+                        old_status=old_status,
+                        new_status='expired'
+                    )
+            # else: in grace period, keep status as 'active'
+
+    @classmethod
+    def sweep_expired(cls, today=None):
+        """
+        Expire every subscription past its grace period in bulk (for the daily cron).
+        Same transition as update_subscription_status, but a fixed number of
+        statements regardless of how many restaurants expire.
+        Returns the number of subscriptions expired.
+        """
+        today = today or date.today()
+
+        expired = list(cls.objects.with_period_end().filter(
+            subscription_start_date__lte=today,
+            period_end__lt=today,
+            is_blocked_by_admin=False,
+        ).exclude(subscription_status='expired').values_list(
+            'pk', 'restaurant_owner_id', 'subscription_status'
+        ))
+        if not expired:
+            return 0
+
+        subscription_ids = [pk for pk, _, _ in expired]
+        owner_ids = [owner_id for _, owner_id, _ in expired]
+
+        with transaction.atomic():
+            cls.objects.filter(pk__in=subscription_ids).update(
+                subscription_status='expired', updated_at=timezone.now()
+            )
+            # Block the owners and all staff under them
+            User.objects.filter(
+                models.Q(pk__in=owner_ids) | models.Q(owner_id__in=owner_ids)
+            ).update(is_active=False)
+            SubscriptionLog.objects.bulk_create([
+                SubscriptionLog(
+                    subscription_id=pk,
                     action='expired',
                     description="Subscription expired and access blocked",
                     old_status=old_status,
                     new_status='expired'
                 )
-            # else: in grace period, keep status as 'active'
-        
+                for pk, _, old_status in expired
+            ])
+        clear_qr_access_cache(owner_ids)
+
+        return len(expired)
+
     def get_subscription_info(self):
         """Get comprehensive subscription information"""
-        today = date.today()
+        state = self._compute_state()
         
         info = {
             'restaurant_name': self.restaurant_owner.restaurant_name or self.restaurant_owner.username,
@@ -732,12 +967,12 @@ class RestaurantSubscription(models.Model):
             'status': self.get_subscription_status_display(),
             'start_date': self.subscription_start_date,
             'end_date': self.subscription_end_date,
-            'is_active': self.is_active,
+            'is_active': state.is_active,
             'is_blocked': self.is_blocked_by_admin,
             'block_reason': self.block_reason,
-            'days_until_expiration': self.days_until_expiration,
-            'is_in_grace_period': self.is_in_grace_period,
-            'days_in_grace_period': self.days_in_grace_period,
+            'days_until_expiration': state.days_to_expire,
+            'is_in_grace_period': state.is_grace,
+            'days_in_grace_period': state.days_in_grace,
             'monthly_fee': self.monthly_fee,
             'last_payment_date': self.last_payment_date,
             'next_billing_date': self.next_billing_date,
@@ -746,6 +981,12 @@ class RestaurantSubscription(models.Model):
         return info
 
 
+@receiver([post_save, post_delete], sender=RestaurantSubscription)
+def clear_subscription_qr_access_cache(sender, instance, **kwargs):
+    """Subscription state is part of the cached QR resolution"""
+    clear_qr_access_cache([instance.restaurant_owner_id])
+
+
 class AuditLog(models.Model):
     """
     General audit log for security events and data changes.
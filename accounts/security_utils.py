@@ -3,30 +3,52 @@ Security Utilities for Restaurant Ordering System
 Provides session validation, input sanitization, and audit logging
 """
 
+import atexit
+import html
 import logging
-import bleach
+import queue
+import re
+import threading
+import time
+import nh3
 from functools import wraps
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.db import close_old_connections, connection
 from django.utils import timezone
 from decimal import Decimal, InvalidOperation
 
+# Only views, template tags and context processors import this module, so the
+# app registry is always ready and models can be imported once here
+from accounts.models import AuditLog, User, _OWNER_ROLES
+from restaurant.models import Product, TableInfo
+
 logger = logging.getLogger(__name__)
 
+# Table numbers: alphanumeric, hyphens, underscores only
+_TABLE_NUMBER_RE = re.compile(r'\A[A-Za-z0-9_-]+\Z')
+
+# Cart price bounds, built once rather than per cart line
+_ZERO = Decimal(0)
+_MAX_PRICE = Decimal('1000000')
+
 
 # ============================================================================
 # SESSION VALIDATION
 # ============================================================================
 
+# Owner columns read by the session-restaurant consumers (views, decorators,
+# select_table template, currency tag)
+_SESSION_OWNER_FIELDS = ('id', 'role_name', 'restaurant_name', 'tax_rate')
+
+
 def validate_session_restaurant_id(session):
     """
     Validate and sanitize the selected_restaurant_id from session.
     Returns the restaurant owner User object or None if invalid.
     """
-    from accounts.models import User
-    
     restaurant_id = session.get('selected_restaurant_id')
     if not restaurant_id:
         return None
@@ -37,23 +59,41 @@ def validate_session_restaurant_id(session):
     except (ValueError, TypeError):
         logger.warning(f"Invalid restaurant_id in session: {restaurant_id}")
         # Clear invalid session data
-        if 'selected_restaurant_id' in session:
-            del session['selected_restaurant_id']
+        session.pop('selected_restaurant_id', None)
         return None
     
-    # Validate the restaurant exists and is an owner
+    # Validate the restaurant exists and is an owner. The owner check uses the
+    # denormalized role_name against a frozenset instead of a role__name IN (...) join
+    # condition; owners never have an owner of their own, so there is no FK to follow.
+    # select_related(None) drops the manager's default role join.
     try:
-        restaurant = User.objects.get(
-            id=restaurant_id,
-            role__name__in=['owner', 'main_owner', 'branch_owner'],
-            is_active=True
-        )
-        return restaurant
+        restaurant = User.objects.select_related(None).only(
+            *_SESSION_OWNER_FIELDS
+        ).get(id=restaurant_id, is_active=True)
     except User.DoesNotExist:
+        restaurant = None
+    
+    if restaurant is None or restaurant.role_name not in _OWNER_ROLES:
         logger.warning(f"Restaurant owner not found for id: {restaurant_id}")
-        if 'selected_restaurant_id' in session:
-            del session['selected_restaurant_id']
+        session.pop('selected_restaurant_id', None)
         return None
+    return restaurant
+
+
+def get_session_restaurant(request):
+    """
+    validate_session_restaurant_id() memoized on the request, so decorators,
+    views and template tags share a single lookup per request.
+    Keyed on the session value, so re-selecting a restaurant mid-request is honoured.
+    """
+    restaurant_id = request.session.get('selected_restaurant_id')
+    cached = getattr(request, '_restaurant_cache', None)
+    if cached is not None and cached[0] == restaurant_id:
+        return cached[1]
+    
+    restaurant = validate_session_restaurant_id(request.session)
+    request._restaurant_cache = (restaurant_id, restaurant)
+    return restaurant
 
 
 def validate_session_table(session, restaurant=None):
@@ -61,8 +101,6 @@ def validate_session_table(session, restaurant=None):
     Validate the selected_table from session.
     Returns (table_number, table_id) tuple or (None, None) if invalid.
     """
-    from restaurant.models import TableInfo
-    
     table_number = session.get('selected_table')
     table_id = session.get('selected_table_id')
     
@@ -70,8 +108,7 @@ def validate_session_table(session, restaurant=None):
         return None, None
     
     # Sanitize table number (alphanumeric, hyphens, underscores only)
-    import re
-    if not re.match(r'^[A-Za-z0-9\-_]+$', str(table_number)):
+    if not _TABLE_NUMBER_RE.match(str(table_number)):
         logger.warning(f"Invalid table number format: {table_number}")
         _clear_table_session(session)
         return None, None
@@ -95,9 +132,8 @@ def validate_session_table(session, restaurant=None):
 
 def _clear_table_session(session):
     """Clear table-related session data"""
-    for key in ['selected_table', 'selected_table_id', 'selected_restaurant_owner']:
-        if key in session:
-            del session[key]
+    for key in ('selected_table', 'selected_table_id', 'selected_restaurant_owner'):
+        session.pop(key, None)
 
 
 def validate_cart_data(cart):
@@ -105,20 +141,31 @@ def validate_cart_data(cart):
     Validate and sanitize cart data from session.
     Returns sanitized cart dict or empty dict if invalid.
     """
-    from restaurant.models import Product
-    
     if not isinstance(cart, dict):
         return {}
     
     sanitized_cart = {}
-    
+
+    # Validate product_id is numeric. Checked with isdecimal() rather than
+    # int()/except so stray keys don't pay for raising ValueError.
+    lines = []
     for product_id, item in cart.items():
-        # Validate product_id is numeric
-        try:
-            pid = int(product_id)
-        except (ValueError, TypeError):
+        pid_str = str(product_id)
+        if pid_str.startswith('-'):
+            digits = pid_str[1:]
+        else:
+            digits = pid_str
+        if not digits.isdecimal():
             continue
-        
+        lines.append((int(pid_str), item))
+
+    # Verify every product in one query instead of one per cart line
+    pids = {pid for pid, _ in lines}
+    available_ids = set(
+        Product.objects.filter(id__in=pids, is_available=True).values_list('id', flat=True)
+    ) if pids else set()
+
+    for pid, item in lines:
         # Validate item structure
         if not isinstance(item, dict):
             continue
@@ -126,25 +173,39 @@ def validate_cart_data(cart):
         # Validate required fields
         try:
             quantity = int(item.get('quantity', 0))
-            price = Decimal(str(item.get('price', 0)))
+            raw_price = item.get('price', 0)
+            # Decimal and int convert exactly; anything else (str, float) goes through str.
+            # bool is excluded so True/False stay invalid prices as before.
+            if isinstance(raw_price, Decimal) or type(raw_price) is int:
+                price = Decimal(raw_price)
+            else:
+                price = Decimal(str(raw_price))
             
             if quantity <= 0 or quantity > 1000:  # Reasonable max quantity
                 continue
-            if price < 0 or price > Decimal('1000000'):  # Reasonable max price
+            if price < _ZERO or price > _MAX_PRICE:  # Reasonable max price
                 continue
             
             # Verify product exists
-            product = Product.objects.filter(id=pid, is_available=True).first()
-            if not product:
+            if pid not in available_ids:
                 continue
             
             # Sanitize name
             name = sanitize_text(str(item.get('name', '')))[:200]
             
+            # Normalize original_price through Decimal too; unparseable values fall back to price
+            original_price = item.get('original_price', price)
+            if not isinstance(original_price, Decimal):
+                try:
+                    original_price = Decimal(str(original_price))
+                except InvalidOperation:
+                    original_price = price
+            price_str = str(price)
+            
             sanitized_cart[str(pid)] = {
                 'name': name,
-                'price': str(price),
-                'original_price': str(item.get('original_price', price)),
+                'price': price_str,
+                'original_price': str(original_price) if original_price != price else price_str,
                 'has_promotion': bool(item.get('has_promotion', False)),
                 'quantity': quantity,
                 'image': item.get('image'),
@@ -160,9 +221,24 @@ def validate_cart_data(cart):
 # ============================================================================
 
 # Allowed HTML tags for rich text (very restrictive)
-ALLOWED_TAGS = ['b', 'i', 'u', 'strong', 'em', 'br']
+ALLOWED_TAGS = frozenset({'b', 'i', 'u', 'strong', 'em', 'br'})
 ALLOWED_ATTRIBUTES = {}
 
+# Empty allow-list for plain-text fields: every tag is stripped
+_NO_TAGS = frozenset()
+
+# Characters nh3 would rewrite (markup, entities, CR, NUL, NBSP). Text without any
+# of them comes back from the cleaner unchanged, so the parser can be skipped.
+_NEEDS_CLEANING_RE = re.compile('[<>&\r\x00\xa0]')
+
+# Drops NUL and CR in one pass (CRLF -> LF)
+_SANITIZE_TRANSLATE = str.maketrans({'\x00': None, '\r': None})
+
+
+def sanitize_html(text):
+    """Clean HTML down to the ALLOWED_TAGS subset (no attributes)"""
+    return nh3.clean(text, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
 
 def sanitize_text(text, max_length=None, strip_html=True):
     """
@@ -178,15 +254,17 @@ def sanitize_text(text, max_length=None, strip_html=True):
     
     text = str(text)
     
-    if strip_html:
-        # Remove all HTML tags
-        text = bleach.clean(text, tags=[], strip=True)
-    else:
-        # Allow only safe HTML tags
-        text = bleach.clean(text, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
-    
-    # Remove null bytes and other dangerous characters
-    text = text.replace('\x00', '').replace('\r\n', '\n')
+    # Plain text (the common case: names, notes, table numbers) needs no parsing
+    if _NEEDS_CLEANING_RE.search(text):
+        if strip_html:
+            # Remove all HTML tags
+            text = nh3.clean(text, tags=_NO_TAGS, attributes=ALLOWED_ATTRIBUTES, strip_comments=True)
+        else:
+            # Allow only safe HTML tags
+            text = sanitize_html(text)
+        
+        # Remove null bytes and other dangerous characters
+        text = text.translate(_SANITIZE_TRANSLATE)
     
     # Truncate if needed
     if max_length and len(text) > max_length:
@@ -195,14 +273,30 @@ def sanitize_text(text, max_length=None, strip_html=True):
     return text.strip()
 
 
+def sanitize_plaintext(text, max_length):
+    """
+    Sanitize short free-text input that never allows HTML.
+    
+    Escapes markup instead of parsing it, so no HTML cleaner runs. Quotes are
+    left alone: these fields are only rendered through autoescaped templates.
+    """
+    if text is None:
+        return ''
+    
+    # The limit counts the user's characters: truncate the raw text, then escape,
+    # so an entity like &amp; is never cut in half
+    text = str(text).translate(_SANITIZE_TRANSLATE).strip()[:max_length]
+    return html.escape(text, quote=False)
+
+
 def sanitize_special_instructions(text):
     """Sanitize order special instructions"""
-    return sanitize_text(text, max_length=500, strip_html=True)
+    return sanitize_plaintext(text, max_length=500)
 
 
 def sanitize_notes(text):
     """Sanitize general notes fields"""
-    return sanitize_text(text, max_length=1000, strip_html=True)
+    return sanitize_plaintext(text, max_length=1000)
 
 
 # ============================================================================
@@ -218,14 +312,13 @@ def require_restaurant_context(view_func):
     def wrapper(request, *args, **kwargs):
         # Staff users get their restaurant automatically
         if request.user.is_authenticated:
-            if hasattr(request.user, 'is_customer_care') and (
-                request.user.is_customer_care() or 
-                request.user.is_kitchen_staff() or 
-                request.user.is_bar_staff() or 
-                request.user.is_buffet_staff() or 
-                request.user.is_service_staff() or 
-                request.user.is_cashier()
-            ):
+            if hasattr(request.user, 'is_restaurant_staff') and request.user.is_restaurant_staff():
+                # Already pinned to their restaurant: skip the owner fetch and the session writes
+                owner_id = request.user.owner_id
+                if (owner_id and request.session.get('selected_restaurant_id') == owner_id
+                        and 'selected_restaurant_name' in request.session):
+                    return view_func(request, *args, **kwargs)
+                
                 restaurant = request.user.get_owner()
                 if restaurant:
                     request.session['selected_restaurant_id'] = restaurant.id
@@ -236,7 +329,7 @@ def require_restaurant_context(view_func):
                     return redirect('accounts:login')
         
         # Validate restaurant from session
-        restaurant = validate_session_restaurant_id(request.session)
+        restaurant = get_session_restaurant(request)
         if not restaurant:
             messages.warning(request, 'Please scan a restaurant QR code to start ordering.')
             return redirect('accounts:login')
@@ -252,7 +345,7 @@ def require_table_selection(view_func):
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        restaurant = validate_session_restaurant_id(request.session)
+        restaurant = get_session_restaurant(request)
         table_number, table_id = validate_session_table(request.session, restaurant)
         
         if not table_number:
@@ -289,7 +382,7 @@ def ajax_restaurant_required(view_func):
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        restaurant = validate_session_restaurant_id(request.session)
+        restaurant = get_session_restaurant(request)
         if not restaurant:
             return JsonResponse({
                 'success': False,
@@ -305,10 +398,154 @@ def ajax_restaurant_required(view_func):
 # AUDIT LOGGING
 # ============================================================================
 
+# Audit rows are written by a background thread in batches, so routine logging
+# doesn't add an INSERT to the request path. Queued rows live only in memory until
+# flushed, so the queue is kept small, and events that must survive a worker crash
+# are written inline, as is anything logged while the writer is unavailable or full.
+_AUDIT_QUEUE_MAXSIZE = 1000
+_AUDIT_BATCH_SIZE = 50
+_AUDIT_FLUSH_INTERVAL = 0.25  # seconds
+_AUDIT_SHUTDOWN_TIMEOUT = 5  # seconds to wait for the writer's current batch at exit
+
+_audit_queue = queue.Queue(maxsize=_AUDIT_QUEUE_MAXSIZE)
+_audit_writer = None
+_audit_writer_lock = threading.Lock()
+_audit_stopping = False
+_audit_table_missing = False
+_AUDIT_STOP = object()  # queued at exit to tell the writer to finish
+
+# Security-critical events: written synchronously, never held in the queue
+_AUDIT_SYNC_EVENTS = frozenset({
+    'login_failed', 'failed_login', 'permission_denied', 'unauthorized_access',
+    'password_change', 'password_reset',
+})
+
+
+def _write_audit_entry(entry):
+    """Insert one audit row, keeping it without the user link if that user is gone"""
+    try:
+        AuditLog.objects.create(**entry)
+        return
+    except Exception as e:
+        if entry.get('user_id') is None:
+            logger.warning(f"Audit log skipped (non-critical): {e}")
+            return
+    try:
+        # username is stored on the row, so the event stays attributable
+        AuditLog.objects.create(**dict(entry, user_id=None))
+    except Exception as e:
+        logger.warning(f"Audit log skipped (non-critical): {e}")
+
+
+def _write_audit_entries(entries):
+    """Insert a batch of queued audit entries; failures are logged, never raised"""
+    if _audit_table_missing:
+        return
+    try:
+        AuditLog.objects.bulk_create([AuditLog(**entry) for entry in entries])
+    except Exception as e:
+        # One bad row fails the whole INSERT; retry row by row so the rest survive
+        logger.warning(f"Audit batch failed, retrying {len(entries)} row(s) individually: {e}")
+        for entry in entries:
+            _write_audit_entry(entry)
+
+
+def _check_audit_table():
+    """Look for the AuditLog table once, when the writer starts"""
+    global _audit_table_missing
+    
+    try:
+        table_name = AuditLog._meta.db_table
+        _audit_table_missing = table_name not in connection.introspection.table_names()
+    except Exception as e:
+        logger.warning(f"Could not check for the audit log table: {e}")
+        return
+    if _audit_table_missing:
+        logger.warning(f"AuditLog table '{table_name}' does not exist. Run migrations.")
+
+
+def _audit_writer_loop():
+    """Drain the audit queue in batches until the exit sentinel arrives"""
+    _check_audit_table()
+    stop = False
+    while not stop:
+        entries = []
+        item = _audit_queue.get()
+        deadline = time.monotonic() + _AUDIT_FLUSH_INTERVAL
+        while True:
+            if item is _AUDIT_STOP:
+                stop = True
+                break
+            entries.append(item)
+            remaining = deadline - time.monotonic()
+            if len(entries) >= _AUDIT_BATCH_SIZE or remaining <= 0:
+                break
+            try:
+                item = _audit_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        
+        if entries:
+            # Respect CONN_MAX_AGE and recover from dropped connections between batches
+            close_old_connections()
+            _write_audit_entries(entries)
+    connection.close()
+
+
+def _flush_audit_queue():
+    """Stop the writer, let it finish its batch, then write whatever is still queued"""
+    global _audit_stopping
+    
+    _audit_stopping = True
+    writer = _audit_writer
+    if writer is not None and writer.is_alive():
+        try:
+            _audit_queue.put(_AUDIT_STOP, timeout=_AUDIT_SHUTDOWN_TIMEOUT)
+        except queue.Full:
+            pass
+        writer.join(_AUDIT_SHUTDOWN_TIMEOUT)
+    
+    entries = []
+    while True:
+        try:
+            item = _audit_queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is not _AUDIT_STOP:
+            entries.append(item)
+    if entries:
+        _write_audit_entries(entries)
+
+
+def _start_audit_writer():
+    """
+    Start the background writer once per process (and again after a fork or a
+    crash). Returns False if no writer is running, so callers write inline.
+    """
+    global _audit_writer
+    
+    with _audit_writer_lock:
+        if _audit_writer is not None and _audit_writer.is_alive():
+            return True
+        if _audit_writer is None:
+            atexit.register(_flush_audit_queue)
+        try:
+            _audit_writer = threading.Thread(
+                target=_audit_writer_loop, name='audit-log-writer', daemon=True
+            )
+            _audit_writer.start()
+        except Exception as e:
+            logger.warning(f"Audit writer could not start, writing inline: {e}")
+            return False
+        return _audit_writer.is_alive()
+
+
 def log_security_event(event_type, user, description, ip_address=None, extra_data=None):
     """
     Log security-related events for audit trail.
     Designed to be non-blocking - failures here should never break main operations.
+    Routine rows are queued and inserted by a background thread; security-critical
+    events (_AUDIT_SYNC_EVENTS) are inserted before returning.
     
     Args:
         event_type: Type of event (login, logout, failed_login, permission_denied, etc.)
@@ -317,44 +554,43 @@ def log_security_event(event_type, user, description, ip_address=None, extra_dat
         ip_address: Client IP address
         extra_data: Dict of additional data to log
     """
-    from django.db import connection
-    
     try:
-        # Import inside function to avoid circular imports
-        from accounts.models import AuditLog
-        
-        # Check if table exists first to avoid transaction errors
-        table_name = AuditLog._meta.db_table
-        all_tables = connection.introspection.table_names()
-        
-        if table_name not in all_tables:
-            logger.warning(f"AuditLog table '{table_name}' does not exist. Run migrations.")
-            return
-        
-        # Safe to create the log entry
-        AuditLog.objects.create(
-            event_type=event_type,
-            user=user if user and user.is_authenticated else None,
-            username=user.username if user and hasattr(user, 'username') else 'anonymous',
-            description=description,
-            ip_address=ip_address or '',
-            extra_data=extra_data or {}
-        )
+        entry = {
+            'event_type': event_type,
+            'user_id': user.pk if user and user.is_authenticated else None,
+            'username': user.username if user and hasattr(user, 'username') else 'anonymous',
+            'description': description,
+            'ip_address': ip_address or '',
+            'extra_data': extra_data or {},
+        }
     except Exception as e:
-        # Silently fail - audit logging should never break main application flow
         logger.warning(f"Audit log skipped (non-critical): {e}")
+        return
+    
+    if event_type in _AUDIT_SYNC_EVENTS or _audit_stopping:
+        # Must not be lost with the in-memory queue, or the writer is shutting down
+        _write_audit_entries([entry])
+        return
+    
+    if (_audit_writer is None or not _audit_writer.is_alive()) and not _start_audit_writer():
+        _write_audit_entries([entry])
+        return
+    
+    try:
+        _audit_queue.put_nowait(entry)
+    except queue.Full:
+        # Writer is falling behind; write this one inline rather than drop it
+        _write_audit_entries([entry])
 
 
 def get_client_ip(request):
     """Get client IP address from request, handling proxies"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    meta = request.META
+    x_forwarded_for = meta.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('HTTP_X_REAL_IP')
-        if not ip:
-            ip = request.META.get('REMOTE_ADDR', '')
-    return ip
+        # First hop is the client; partition avoids building a list for a single IP
+        return x_forwarded_for.partition(',')[0].strip()
+    return meta.get('HTTP_X_REAL_IP') or meta.get('REMOTE_ADDR', '')
 
 
 def audit_action(action_type, model_name=None):
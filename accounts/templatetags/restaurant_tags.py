@@ -3,6 +3,9 @@ from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from decimal import Decimal
 
+from accounts.models import User
+from restaurant.models_restaurant import Restaurant
+
 register = template.Library()
 
 # Currency symbols mapping (kept in sync with models)
@@ -25,42 +28,68 @@ CURRENCY_SYMBOLS = {
 }
 
 # Currencies that typically don't use decimal places
-INTEGER_CURRENCIES = ['KES', 'TZS', 'UGX', 'RWF', 'JPY']
+INTEGER_CURRENCIES = frozenset({'KES', 'TZS', 'UGX', 'RWF', 'JPY'})
 
 
 def get_user_currency_info(user, request=None):
     """
     Get currency info for a user, handling all ownership types.
     Returns (currency_code, currency_symbol)
+    
+    Memoized on the request: a page renders many prices but resolves the
+    currency once. Keyed on the user and selected restaurant so a change
+    mid-request is picked up.
     """
     if not user or not user.is_authenticated:
         return 'USD', '$'
     
+    if request is None:
+        return _resolve_currency_info(user, request)
+    
+    session = getattr(request, 'session', None)
+    key = (user.pk, session.get('selected_restaurant_id') if session is not None else None)
+    cached = getattr(request, '_currency_cache', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    info = _resolve_currency_info(user, request)
+    request._currency_cache = (key, info)
+    return info
+
+
+def _session_owner(request):
+    """
+    Owner selected in the session, for display only. Rendering must not change
+    the session, so unlike get_session_restaurant() this never clears the key;
+    it reuses the owner the view decorators already resolved when there is one.
+    """
+    raw_id = request.session.get('selected_restaurant_id')
+    if not raw_id:
+        return None
+    try:
+        owner_id = int(raw_id)
+    except (TypeError, ValueError):
+        return None
+    
+    cached = getattr(request, '_restaurant_cache', None)
+    if cached is not None and cached[0] == raw_id and cached[1] is not None:
+        return cached[1]
+    return User.objects.select_related(None).only('id', 'role_name').filter(pk=owner_id).first()
+
+
+def _resolve_currency_info(user, request):
+    """Uncached body of get_user_currency_info()"""
     # Try to get currency from Restaurant model first (for branch support)
     try:
-        from restaurant.models_restaurant import Restaurant
-        
         # Check session for selected restaurant
         if request and hasattr(request, 'session'):
-            selected_restaurant_id = request.session.get('selected_restaurant_id')
-            if selected_restaurant_id:
-                # Get the restaurant from selected owner
+            selected_user = _session_owner(request)
+            if selected_user:
+                # Get the restaurant currency from selected owner (cached per owner)
                 try:
-                    from accounts.models import User
-                    selected_user = User.objects.get(id=selected_restaurant_id)
-                    if selected_user.is_branch_owner():
-                        restaurant = Restaurant.objects.filter(
-                            branch_owner=selected_user, 
-                            is_main_restaurant=False
-                        ).first()
-                    else:
-                        restaurant = Restaurant.objects.filter(
-                            main_owner=selected_user, 
-                            is_main_restaurant=True
-                        ).first()
-                    
-                    if restaurant:
-                        return restaurant.currency_code, restaurant.get_currency_symbol()
+                    currency_code = Restaurant.get_owner_currency_code(selected_user)
+                    if currency_code:
+                        return currency_code, Restaurant.CURRENCY_SYMBOLS.get(currency_code, '$')
                 except Exception:
                     pass
         
@@ -89,6 +118,30 @@ def currency_symbol(context):
     return symbol
 
 
+def build_price_format(symbol, use_decimals):
+    """str.format template for a price, e.g. 'KSh{:,.0f}' (braces in the symbol are escaped)"""
+    symbol = symbol.replace('{', '{{').replace('}', '}}')
+    return symbol + ('{:,.2f}' if use_decimals else '{:,.0f}')
+
+
+# Prebuilt per-currency templates for the currency filter; unknown codes fall back to USD
+_CURRENCY_FORMATS = {
+    code: build_price_format(symbol, code not in INTEGER_CURRENCIES)
+    for code, symbol in CURRENCY_SYMBOLS.items()
+}
+_DEFAULT_PRICE_FORMAT = build_price_format('$', True)
+
+
+def _format_amount(price_format, value):
+    """
+    Apply a price template. Numbers are formatted directly (Decimals keep their
+    precision); anything else goes through float(), raising TypeError/ValueError.
+    """
+    if not isinstance(value, (Decimal, int, float)):
+        value = float(value) if value else 0.0
+    return price_format.format(value)
+
+
 @register.filter
 def currency(value, user=None):
     """
@@ -98,22 +151,33 @@ def currency(value, user=None):
     if user is None:
         # Default to USD if no user provided
         symbol = '$'
-        use_decimals = True
+        price_format = _DEFAULT_PRICE_FORMAT
     else:
         currency_code = getattr(user, 'currency_code', 'USD')
         symbol = CURRENCY_SYMBOLS.get(currency_code, '$')
-        use_decimals = currency_code not in INTEGER_CURRENCIES
+        price_format = _CURRENCY_FORMATS.get(currency_code, _DEFAULT_PRICE_FORMAT)
     
     try:
-        amount = float(value) if value else 0.0
-        if use_decimals:
-            return f"{symbol}{amount:,.2f}"
-        else:
-            return f"{symbol}{amount:,.0f}"
+        return _format_amount(price_format, value)
     except (TypeError, ValueError):
         return f"{symbol}0.00"
 
 
+@register.filter
+def currency_fast(value, currency_info):
+    """
+    Format a price with the request's precomputed currency.
+    Usage in templates: {{ price|currency_fast:currency_ctx }}
+    Output is escaped to prevent XSS.
+    """
+    _, symbol, _, price_format = currency_info
+    
+    try:
+        return mark_safe(_format_amount(price_format, value))
+    except (TypeError, ValueError):
+        return mark_safe(f"{escape(symbol)}0.00")
+
+
 @register.simple_tag(takes_context=True)
 def format_price(context, value):
     """
@@ -121,23 +185,19 @@ def format_price(context, value):
     Usage in templates: {% format_price price %}
     Output is escaped to prevent XSS.
     """
-    request = context.get('request')
-    user = context.get('user')
-    
-    currency_code, symbol = get_user_currency_info(user, request)
-    use_decimals = currency_code not in INTEGER_CURRENCIES
-    
-    # Escape symbol to prevent XSS if currency data is manipulated
-    safe_symbol = escape(symbol)
+    # Resolved once per request by accounts.context_processors.currency_ctx
+    currency_info = context.get('currency_ctx')
+    if currency_info is not None:
+        _, symbol, _, price_format = currency_info
+    else:
+        currency_code, symbol = get_user_currency_info(context.get('user'), context.get('request'))
+        # Escape symbol to prevent XSS if currency data is manipulated
+        price_format = build_price_format(escape(symbol), currency_code not in INTEGER_CURRENCIES)
     
     try:
-        amount = float(value) if value else 0.0
-        if use_decimals:
-            return mark_safe(f"{safe_symbol}{amount:,.2f}")
-        else:
-            return mark_safe(f"{safe_symbol}{amount:,.0f}")
+        return mark_safe(_format_amount(price_format, value))
     except (TypeError, ValueError):
-        return mark_safe(f"{safe_symbol}0.00")
+        return mark_safe(f"{escape(symbol)}0.00")
 
 
 @register.simple_tag(takes_context=True)
@@ -154,7 +214,7 @@ def get_restaurant_name(context):
     elif user.is_owner() or user.is_main_owner() or user.is_branch_owner():
         # Use get_restaurant_name for all owners to handle branch→main logic
         return user.get_restaurant_name(request)
-    elif user.is_kitchen_staff() or user.is_bar_staff() or user.is_buffet_staff() or user.is_service_staff() or user.is_cashier() or user.is_customer_care():
+    elif user.is_restaurant_staff():
         # For staff members, use the get_restaurant_name method
         return user.get_restaurant_name(request)
     
@@ -5,13 +5,21 @@ from django.contrib import messages
 from django.urls import reverse
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.views.decorators.http import require_POST
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import date
 from decimal import Decimal
-import json
 import logging
+import orjson
+from orders.models import Order
+from restaurant.models_restaurant import Restaurant
 from .forms import UserRegistrationForm, UserLoginForm, OwnerRegistrationForm, CustomerRegistrationForm
-from .models import Role, User
+from .models import (
+    QR_ACCESS_CACHE_KEY, QR_ACCESS_CACHE_TIMEOUT, RestaurantSubscription, User, _OWNER_ROLES, get_role,
+)
+from .security_utils import get_client_ip, log_security_event
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +35,31 @@ except ImportError:
     def rate_limit_registration(func):
         return func
 
+# Staff roles listed on the owner/admin profile page
+_PROFILE_STAFF_ROLES = frozenset({'customer_care', 'kitchen'})
+
+# Post-login landing page per role; everyone else goes to the menu
+LOGIN_REDIRECTS = {
+    'administrator': 'system_admin:dashboard',  # Redirect admins to system dashboard
+    'owner': 'admin_panel:admin_dashboard',  # Owners now use admin panel
+    'main_owner': 'admin_panel:admin_dashboard',
+    'branch_owner': 'admin_panel:admin_dashboard',
+    'kitchen': 'orders:kitchen_dashboard',
+    'customer_care': 'orders:customer_care_dashboard',
+    'cashier': 'cashier:dashboard',
+}
+
+# Profile template per role; customers (and anyone else) get the customer profile
+PROFILE_TEMPLATES = {
+    'administrator': 'accounts/profile_admin.html',
+    'owner': 'accounts/profile_owner.html',
+    'main_owner': 'accounts/profile_owner.html',
+    'branch_owner': 'accounts/profile_owner.html',
+    'customer_care': 'accounts/profile_customer_care.html',
+    'kitchen': 'accounts/profile_kitchen.html',
+    'cashier': 'accounts/profile_cashier.html',
+}
+
 @ensure_csrf_cookie
 @rate_limit_login
 def login_view(request):
@@ -45,13 +78,12 @@ def login_view(request):
                 
                 # Log successful login
                 try:
-                    from .security_utils import log_security_event, get_client_ip
                     log_security_event(
                         event_type='login',
                         user=user,
                         description=f"User '{user.username}' logged in successfully",
                         ip_address=get_client_ip(request),
-                        extra_data={'role': user.role.name if user.role else 'no_role'}
+                        extra_data={'role': user.role_name or 'no_role'}
                     )
                 except Exception as e:
                     logger.warning(f"Failed to log login event: {e}")
@@ -59,22 +91,10 @@ def login_view(request):
                 messages.success(request, f'Welcome back, {user.first_name or user.username}!')
                 
                 # Role-based redirect
-                if user.is_administrator():
-                    return redirect('system_admin:dashboard')  # Redirect admins to system dashboard
-                elif user.is_owner():
-                    return redirect('admin_panel:admin_dashboard')  # Owners now use admin panel
-                elif user.is_kitchen_staff():
-                    return redirect('orders:kitchen_dashboard')
-                elif user.is_customer_care():
-                    return redirect('orders:customer_care_dashboard')
-                elif user.is_cashier():
-                    return redirect('cashier:dashboard')
-                else:
-                    return redirect('restaurant:menu')
+                return redirect(LOGIN_REDIRECTS.get(user.role_name, 'restaurant:menu'))
             else:
                 # Log failed login attempt
                 try:
-                    from .security_utils import log_security_event, get_client_ip
                     log_security_event(
                         event_type='login_failed',
                         user=None,
@@ -98,7 +118,6 @@ def logout_view(request):
     # Log logout event before clearing session
     try:
         if request.user.is_authenticated:
-            from .security_utils import log_security_event, get_client_ip
             log_security_event(
                 event_type='logout',
                 user=request.user,
@@ -108,16 +127,7 @@ def logout_view(request):
     except Exception as e:
         logger.warning(f"Failed to log logout event: {e}")
     
-    # Clear cart and session data before logout
-    if 'cart' in request.session:
-        del request.session['cart']
-    if 'selected_table' in request.session:
-        del request.session['selected_table']
-    if 'selected_restaurant_id' in request.session:
-        del request.session['selected_restaurant_id']
-    if 'selected_restaurant_name' in request.session:
-        del request.session['selected_restaurant_name']
-    
+    # logout() flushes the whole session, clearing the cart and restaurant selection
     logout(request)
     messages.success(request, 'You have been logged out successfully. Your cart has been cleared.')
     return redirect('accounts:login')
@@ -136,11 +146,7 @@ def register_view(request):
             user.set_password(form.cleaned_data['password'])
             
             # Set default role as customer
-            from .models import Role
-            customer_role, created = Role.objects.get_or_create(
-                name='customer',
-                defaults={'description': 'Customer'}
-            )
+            customer_role = get_role('customer', 'Customer')
             user.role = customer_role
             user.owner = None  # Customers don't have an owner initially
             user.save()
@@ -168,10 +174,7 @@ def register_owner_view(request):
             user.set_password(form.cleaned_data['password'])
             
             # Set role as owner
-            owner_role, created = Role.objects.get_or_create(
-                name='owner',
-                defaults={'description': 'Restaurant Owner'}
-            )
+            owner_role = get_role('owner', 'Restaurant Owner')
             user.role = owner_role
             user.owner = None  # Owners don't have an owner
             user.save()
@@ -191,13 +194,18 @@ def profile_view(request):
     # Get user's recent orders for customer care profiles only
     recent_orders = []
     if user.is_customer_care():
-        from orders.models import Order
         recent_orders = Order.objects.filter(ordered_by=user).order_by('-created_at')[:5]
     
     # Get staff management data for owner/admin
     staff_users = []
     if user.is_owner() or user.is_administrator():
-        staff_users = User.objects.filter(role__name__in=['customer_care', 'kitchen']).select_related('role')
+        # Only the columns the profile templates render
+        staff_users = User.objects.filter(
+            role_name__in=_PROFILE_STAFF_ROLES
+        ).select_related('role').only(
+            'id', 'username', 'first_name', 'last_name', 'email', 'is_active',
+            'role__name', 'role__description',
+        )
     
     context = {
         'user': user,
@@ -207,317 +215,291 @@ def profile_view(request):
     }
     
     # Role-based template selection
-    if user.is_administrator():
-        template = 'accounts/profile_admin.html'
-    elif user.is_owner():
-        template = 'accounts/profile_owner.html'
-    elif user.is_customer_care():
-        template = 'accounts/profile_customer_care.html'
-    elif user.is_kitchen_staff():
-        template = 'accounts/profile_kitchen.html'
-    elif user.is_cashier():
-        template = 'accounts/profile_cashier.html'
-    else:  # customer
-        template = 'accounts/profile_customer.html'
+    template = PROFILE_TEMPLATES.get(user.role_name, 'accounts/profile_customer.html')
     
     return render(request, template, context)
 
-def qr_code_access(request, qr_code):
-    """Handle QR code access to restaurant"""
+# Columns _load_qr_access() reads, so the joined QR lookup rows stay narrow
+_QR_OWNER_FIELDS = (
+    'is_active', 'restaurant_name', 'restaurant_description', 'address', 'phone_number', 'email',
+)
+_QR_SUBSCRIPTION_FIELDS = (
+    'subscription_start_date', 'subscription_end_date', 'grace_period_days',
+    'subscription_status', 'is_blocked_by_admin',
+)
+_QR_RESTAURANT_FIELDS = (
+    'name', 'is_main_restaurant', 'parent_restaurant__name',
+    *(f'{owner}__{field}' for owner in ('main_owner', 'branch_owner') for field in _QR_OWNER_FIELDS),
+    *(f'main_owner__subscription__{field}' for field in _QR_SUBSCRIPTION_FIELDS),
+)
+
+
+def _display_name(restaurant_obj, owner):
+    """Name shown to customers - for branches, the main restaurant's name"""
+    if restaurant_obj is None:
+        return owner.restaurant_name
+    if not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant_id:
+        return restaurant_obj.parent_restaurant.name
+    return restaurant_obj.name
+
+
+def _load_qr_access(qr_code):
+    """
+    Resolve a QR code to the restaurant data the QR views need.
+    Returns a plain dict (safe to cache) or None if the code doesn't lead to an
+    active restaurant owner.
+    """
+    # First try to find restaurant by QR code in Restaurant model (new system)
+    restaurant_obj = None
+    
     try:
-        # Clean the QR code - remove any trailing slashes or whitespace
-        qr_code = qr_code.strip().rstrip('/')
-        
-        # First try to find restaurant by QR code in Restaurant model (new system)
-        from restaurant.models_restaurant import Restaurant
-        restaurant_obj = None
-        user_restaurant = None
-        
+        # The subscription always belongs to main_owner (branches use the main
+        # owner's PRO plan), so it comes back in the same query
+        restaurant_obj = Restaurant.objects.select_related(
+            'main_owner__subscription', 'branch_owner', 'parent_restaurant'
+        ).only(*_QR_RESTAURANT_FIELDS).get(qr_code=qr_code)
+        # Get the associated user (main_owner or branch_owner)
+        # For branches, use branch_owner; for main restaurants, use main_owner
+        owner = restaurant_obj.main_owner if restaurant_obj.is_main_restaurant else restaurant_obj.branch_owner
+    except Restaurant.DoesNotExist:
+        # Fallback: try to find in User model (legacy system)
+        try:
+            owner = User.objects.get(
+                restaurant_qr_code=qr_code,
+                role_name__in=_OWNER_ROLES,
+                is_active=True
+            )
+        except User.DoesNotExist:
+            return None
+        # Try to get the corresponding Restaurant object
+        # Check if branch owner first, then main owner
         try:
-            restaurant_obj = Restaurant.objects.get(qr_code=qr_code)
-            # Get the associated user (main_owner or branch_owner)
-            # For branches, use branch_owner; for main restaurants, use main_owner
-            user_restaurant = restaurant_obj.main_owner if restaurant_obj.is_main_restaurant else restaurant_obj.branch_owner
+            if owner.is_branch_owner():
+                restaurant_obj = Restaurant.objects.select_related(
+                    'main_owner__subscription', 'parent_restaurant'
+                ).get(branch_owner=owner, is_main_restaurant=False)
+            else:
+                restaurant_obj = Restaurant.objects.select_related(
+                    'main_owner__subscription'
+                ).get(main_owner=owner, is_main_restaurant=True)
         except Restaurant.DoesNotExist:
-            # Fallback: try to find in User model (legacy system)
-            try:
-                user_restaurant = User.objects.get(
-                    restaurant_qr_code=qr_code, 
-                    role__name__in=['owner', 'main_owner', 'branch_owner'], 
-                    is_active=True
-                )
-                # Try to get the corresponding Restaurant object
-                # Check if branch owner first, then main owner
-                try:
-                    if user_restaurant.is_branch_owner():
-                        restaurant_obj = Restaurant.objects.get(branch_owner=user_restaurant, is_main_restaurant=False)
-                    else:
-                        restaurant_obj = Restaurant.objects.get(main_owner=user_restaurant, is_main_restaurant=True)
-                except Restaurant.DoesNotExist:
-                    # Legacy user without Restaurant object - create minimal context
-                    restaurant_obj = None
-            except User.DoesNotExist:
-                raise User.DoesNotExist("QR code not found in either system")
-        
-        # Ensure we have a valid user
-        if not user_restaurant or not user_restaurant.is_active:
-            raise User.DoesNotExist("Restaurant owner not found or inactive")
-        
-        # For compatibility, set restaurant variable to user_restaurant for legacy code
-        restaurant = user_restaurant
-        
-        # Check if restaurant subscription is active
-        # For branches (PRO plan), check the MAIN owner's subscription
-        from accounts.models import RestaurantSubscription
-        
-        # Determine which owner's subscription to check
-        subscription_owner = restaurant
-        if restaurant_obj and not restaurant_obj.is_main_restaurant:
-            # This is a branch - check the main owner's subscription (PRO plan cascade)
-            subscription_owner = restaurant_obj.main_owner
-        
+            # Legacy user without Restaurant object - create minimal context
+            restaurant_obj = None
+    
+    # Ensure we have a valid user
+    if not owner or not owner.is_active:
+        return None
+    
+    # Check the main owner's subscription - for branches too (PRO plan cascade)
+    if restaurant_obj:
         try:
-            subscription = RestaurantSubscription.objects.get(restaurant_owner=subscription_owner)
-            if not subscription.is_active:
-                # Restaurant is blocked - show unavailable message
-                reason = "This restaurant is temporarily unavailable."
-                if subscription.is_blocked_by_admin:
-                    reason = "This restaurant is temporarily suspended. Please contact the restaurant for more information."
-                elif subscription.subscription_status == 'expired':
-                    reason = "This restaurant is temporarily unavailable due to expired subscription."
-                
-                from django.utils import timezone
-                # Get display name for branches
-                display_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-                if restaurant_obj and not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant:
-                    display_name = restaurant_obj.parent_restaurant.name
-                
-                return render(request, 'accounts/restaurant_unavailable.html', {
-                    'restaurant': restaurant,
-                    'restaurant_obj': restaurant_obj,  # Pass Restaurant object if available
-                    'qr_code': qr_code,
-                    'reason': reason,
-                    'subscription_status': subscription.subscription_status,
-                    'current_time': timezone.now(),
-                    'display_name': display_name
-                })
+            subscription = restaurant_obj.main_owner.subscription
         except RestaurantSubscription.DoesNotExist:
-            # No subscription - restaurant unavailable
-            from django.utils import timezone
-            # Get display name for branches
-            display_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-            if restaurant_obj and not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant:
-                display_name = restaurant_obj.parent_restaurant.name
-            
-            return render(request, 'accounts/restaurant_unavailable.html', {
-                'restaurant': restaurant,
-                'restaurant_obj': restaurant_obj,  # Pass Restaurant object if available
-                'qr_code': qr_code,
-                'reason': "This restaurant is temporarily unavailable.",
-                'subscription_status': 'no_subscription',
-                'current_time': timezone.now(),
-                'display_name': display_name
-            })
-        
+            subscription = None
+    else:
+        # Legacy owner without a Restaurant object
+        subscription = RestaurantSubscription.objects.only(
+            *_QR_SUBSCRIPTION_FIELDS
+        ).filter(restaurant_owner_id=owner.id).first()
+    
+    # is_active depends on today's date, so cache the window it holds for rather
+    # than the flag itself; a cached entry then stays correct across midnight
+    active_window = None
+    if (subscription and subscription.subscription_status == 'active'
+            and not subscription.is_blocked_by_admin):
+        active_window = (subscription.subscription_start_date, subscription._compute_state().grace_end)
+    
+    return {
         # Store restaurant in session - ALWAYS use User ID (owner)
         # select_table expects User.objects.get(id=selected_restaurant_id)
-        # restaurant = user_restaurant (always a User object)
-        request.session['selected_restaurant_id'] = restaurant.id  # User ID
-        request.session['selected_restaurant_name'] = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-        request.session['access_method'] = 'qr_code'
-        
-        # If user is not logged in, show restaurant info and prompt for login/register
-        if not request.user.is_authenticated:
-            # Get the display name - for branches, show main restaurant name
-            display_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-            if restaurant_obj and not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant:
-                display_name = restaurant_obj.parent_restaurant.name
-            
-            return render(request, 'accounts/qr_restaurant_access.html', {
-                'restaurant': restaurant,
-                'restaurant_obj': restaurant_obj,  # Pass Restaurant object if available
-                'qr_code': qr_code,
-                'display_name': display_name
-            })
-        
-        # If user is already logged in as customer, switch restaurant context and continue
-        if request.user.is_customer():
-            restaurant_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-            messages.success(request, f'Welcome to {restaurant_name}!')
-            return redirect('orders:select_table')
-        
-        # If user is staff of this restaurant, redirect to appropriate dashboard
-        if request.user.get_owner() == restaurant:
-            if request.user.is_kitchen_staff():
-                return redirect('orders:kitchen_dashboard')
-            elif request.user.is_cashier():
-                return redirect('cashier:dashboard')
-            elif request.user.is_owner():
-                return redirect('admin_panel:admin_dashboard')
-        
-        # Default: redirect to menu
-        restaurant_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-        messages.success(request, f'Welcome to {restaurant_name}!')
-        return redirect('restaurant:menu')
-        
-    except User.DoesNotExist:
+        'owner_id': owner.id,
+        'restaurant_name': restaurant_obj.name if restaurant_obj else owner.restaurant_name,
+        'display_name': _display_name(restaurant_obj, owner),
+        # Owner details the QR templates render as {{ restaurant.* }}
+        'contact': {
+            'restaurant_description': owner.restaurant_description,
+            'address': owner.address,
+            'phone_number': owner.phone_number,
+            'email': owner.email,
+        },
+        'subscription_status': subscription.subscription_status if subscription else 'no_subscription',
+        'is_blocked_by_admin': subscription.is_blocked_by_admin if subscription else False,
+        'active_window': active_window,
+    }
+
+
+def _get_qr_access(qr_code):
+    """Cached _load_qr_access(); unknown codes are not cached"""
+    cache_key = QR_ACCESS_CACHE_KEY.format(qr_code)
+    access = cache.get(cache_key)
+    if access is None:
+        access = _load_qr_access(qr_code)
+        if access is not None:
+            cache.set(cache_key, access, QR_ACCESS_CACHE_TIMEOUT)
+    return access
+
+
+def _qr_subscription_active(access):
+    """Same result as RestaurantSubscription.is_active, from the cached window"""
+    window = access['active_window']
+    return window is not None and window[0] <= date.today() <= window[1]
+
+
+def qr_code_access(request, qr_code):
+    """Handle QR code access to restaurant"""
+    # Clean the QR code - remove surrounding whitespace (the <str:> URL converter
+    # never matches '/', so there are no slashes to strip)
+    qr_code = qr_code.strip()
+    
+    access = _get_qr_access(qr_code)
+    if access is None:
         # Log the QR code that failed for debugging
         logger.warning(f"QR Code Access Failed: '{qr_code}'")
         messages.error(request, f'Invalid QR code. Restaurant not found. (Code: {qr_code})')
         return redirect('accounts:login')
+    
+    display_name = access['display_name']
+    
+    # Check if restaurant subscription is active
+    # For branches (PRO plan), the MAIN owner's subscription was checked
+    if not _qr_subscription_active(access):
+        # Restaurant is blocked - show unavailable message
+        reason = "This restaurant is temporarily unavailable."
+        if access['is_blocked_by_admin']:
+            reason = "This restaurant is temporarily suspended. Please contact the restaurant for more information."
+        elif access['subscription_status'] == 'expired':
+            reason = "This restaurant is temporarily unavailable due to expired subscription."
+        
+        return render(request, 'accounts/restaurant_unavailable.html', {
+            'restaurant': access['contact'],
+            'qr_code': qr_code,
+            'reason': reason,
+            'subscription_status': access['subscription_status'],
+            'current_time': timezone.now(),
+            'display_name': display_name
+        })
+    
+    # Store restaurant in session - ALWAYS use User ID (owner)
+    # select_table expects User.objects.get(id=selected_restaurant_id)
+    request.session.update({
+        'selected_restaurant_id': access['owner_id'],  # User ID
+        'selected_restaurant_name': access['restaurant_name'],
+        'access_method': 'qr_code',
+    })
+    
+    # If user is not logged in, show restaurant info and prompt for login/register
+    if not request.user.is_authenticated:
+        return render(request, 'accounts/qr_restaurant_access.html', {
+            'restaurant': access['contact'],
+            'qr_code': qr_code,
+            'display_name': display_name
+        })
+    
+    # If user is already logged in as customer, switch restaurant context and continue
+    if request.user.is_customer():
+        messages.success(request, f"Welcome to {access['restaurant_name']}!")
+        return redirect('orders:select_table')
+    
+    # If user is staff of this restaurant, redirect to appropriate dashboard
+    user_owner_id = request.user.id if request.user.is_owner() else request.user.owner_id
+    if user_owner_id == access['owner_id']:
+        if request.user.is_kitchen_staff():
+            return redirect('orders:kitchen_dashboard')
+        elif request.user.is_cashier():
+            return redirect('cashier:dashboard')
+        elif request.user.is_owner():
+            return redirect('admin_panel:admin_dashboard')
+    
+    # Default: redirect to menu
+    messages.success(request, f"Welcome to {access['restaurant_name']}!")
+    return redirect('restaurant:menu')
 
 
+@rate_limit_registration
 def customer_register_view(request, qr_code):
     """Customer registration specifically for QR code access"""
-    try:
-        # Clean the QR code
-        qr_code = qr_code.strip().rstrip('/')
-        
-        # First try to find restaurant by QR code in Restaurant model (new system)
-        from restaurant.models_restaurant import Restaurant
-        restaurant_obj = None
-        user_restaurant = None
-        
-        try:
-            restaurant_obj = Restaurant.objects.get(qr_code=qr_code)
-            # Get the associated user (main_owner or branch_owner)
-            # For branches, use branch_owner; for main restaurants, use main_owner
-            user_restaurant = restaurant_obj.main_owner if restaurant_obj.is_main_restaurant else restaurant_obj.branch_owner
-        except Restaurant.DoesNotExist:
-            # Fallback: try to find in User model (legacy system)
-            user_restaurant = User.objects.get(
-                restaurant_qr_code=qr_code,
-                role__name__in=['owner', 'main_owner', 'branch_owner'],
-                is_active=True
-            )
-            # Try to get the corresponding Restaurant object
-            try:
-                if user_restaurant.is_branch_owner():
-                    restaurant_obj = Restaurant.objects.get(branch_owner=user_restaurant, is_main_restaurant=False)
-                else:
-                    restaurant_obj = Restaurant.objects.get(main_owner=user_restaurant, is_main_restaurant=True)
-            except Restaurant.DoesNotExist:
-                restaurant_obj = None
-        
-        # For compatibility, set restaurant variable to user_restaurant for legacy code
-        restaurant = user_restaurant
-        
-        # Check if restaurant subscription is active before allowing registration
-        # For branches (PRO plan), check the MAIN owner's subscription
-        from accounts.models import RestaurantSubscription
-        
-        # Determine which owner's subscription to check
-        subscription_owner = restaurant
-        if restaurant_obj and not restaurant_obj.is_main_restaurant:
-            # This is a branch - check the main owner's subscription (PRO plan cascade)
-            subscription_owner = restaurant_obj.main_owner
+    # Clean the QR code
+    qr_code = qr_code.strip()
+    
+    access = _get_qr_access(qr_code)
+    if access is None:
+        messages.error(request, 'Invalid QR code. Restaurant not found.')
+        return redirect('accounts:login')
+    
+    display_name = access['display_name']
+    
+    # Check if restaurant subscription is active before allowing registration
+    # For branches (PRO plan), the MAIN owner's subscription was checked
+    if not _qr_subscription_active(access):
+        # Restaurant is blocked - show unavailable message instead of registration
+        reason = "This restaurant is temporarily unavailable for new registrations."
+        if access['is_blocked_by_admin']:
+            reason = "This restaurant is temporarily suspended. New registrations are not available."
+        elif access['subscription_status'] == 'expired':
+            reason = "This restaurant is temporarily unavailable due to expired subscription."
         
-        try:
-            subscription = RestaurantSubscription.objects.get(restaurant_owner=subscription_owner)
-            if not subscription.is_active:
-                # Restaurant is blocked - show unavailable message instead of registration
-                reason = "This restaurant is temporarily unavailable for new registrations."
-                if subscription.is_blocked_by_admin:
-                    reason = "This restaurant is temporarily suspended. New registrations are not available."
-                elif subscription.subscription_status == 'expired':
-                    reason = "This restaurant is temporarily unavailable due to expired subscription."
-                
-                from django.utils import timezone
-                # Get display name for branches
-                display_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-                if restaurant_obj and not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant:
-                    display_name = restaurant_obj.parent_restaurant.name
-                
-                return render(request, 'accounts/restaurant_unavailable.html', {
-                    'restaurant': restaurant,
-                    'qr_code': qr_code,
-                    'reason': reason,
-                    'subscription_status': subscription.subscription_status,
-                    'current_time': timezone.now(),
-                    'display_name': display_name
-                })
-        except RestaurantSubscription.DoesNotExist:
-            # No subscription - registration not available
-            from django.utils import timezone
-            # Get display name for branches
-            display_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-            if restaurant_obj and not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant:
-                display_name = restaurant_obj.parent_restaurant.name
+        return render(request, 'accounts/restaurant_unavailable.html', {
+            'restaurant': access['contact'],
+            'qr_code': qr_code,
+            'reason': reason,
+            'subscription_status': access['subscription_status'],
+            'current_time': timezone.now(),
+            'display_name': display_name
+        })
+    
+    if request.method == 'POST':
+        form = CustomerRegistrationForm(request.POST)
+        if form.is_valid():
+            user = form.save(commit=False)
+            user.set_password(form.cleaned_data['password'])
             
-            return render(request, 'accounts/restaurant_unavailable.html', {
-                'restaurant': restaurant,
-                'qr_code': qr_code,
-                'reason': "This restaurant is temporarily unavailable for new registrations.",
-                'subscription_status': 'no_subscription',
-                'current_time': timezone.now(),
-                'display_name': display_name
-            })
-        
-        if request.method == 'POST':
-            form = CustomerRegistrationForm(request.POST)
-            if form.is_valid():
-                user = form.save(commit=False)
-                user.set_password(form.cleaned_data['password'])
-                
-                # Set as customer role
-                customer_role, created = Role.objects.get_or_create(
-                    name='customer',
-                    defaults={'description': 'Customer'}
-                )
-                user.role = customer_role
-                user.owner = None  # Universal customer - not tied to specific restaurant
-                user.save()
-                
-                # Auto-login the user
-                user = authenticate(
-                    request=request,
-                    username=form.cleaned_data['username'],
-                    password=form.cleaned_data['password']
-                )
-                if user:
-                    login(request, user)
-                    
-                    # Store restaurant info in session AFTER login (login() cycles session)
-                    # ALWAYS store the USER (owner) ID, NOT the Restaurant object ID
-                    # This is what select_table expects: User.objects.get(id=selected_restaurant_id)
-                    request.session['selected_restaurant_id'] = restaurant.id  # restaurant = user_restaurant (User model)
-                    request.session['selected_restaurant_name'] = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-                    request.session['access_method'] = 'qr_code'
-                    request.session.modified = True  # Force session save
-                    
-                    # Use display name for message (main restaurant name for branches)
-                    display_name_msg = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-                    if restaurant_obj and not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant:
-                        display_name_msg = restaurant_obj.parent_restaurant.name
-                    messages.success(request, f'Welcome to {display_name_msg}! Account created successfully.')
-                    return redirect('orders:select_table')
-                
-        else:
-            form = CustomerRegistrationForm()
+            # Set as customer role
+            customer_role = get_role('customer', 'Customer')
+            user.role = customer_role
+            user.owner = None  # Universal customer - not tied to specific restaurant
+            user.save()
             
-            # Store restaurant info in session for GET requests too
-            # This ensures session data is available even if user refreshes
+            # Auto-login the user - the password was just set, so there is
+            # nothing for authenticate() to verify; name the backend directly
+            login(request, user, backend='accounts.backends.RoleModelBackend')
+            
+            # Store restaurant info in session AFTER login (login() cycles session)
             # ALWAYS store the USER (owner) ID, NOT the Restaurant object ID
-            request.session['selected_restaurant_id'] = restaurant.id  # restaurant = user_restaurant (User model)
-            request.session['selected_restaurant_name'] = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-            request.session['access_method'] = 'qr_code'
-        
-        # Get the display name - for branches, show main restaurant name
-        display_name = restaurant_obj.name if restaurant_obj else restaurant.restaurant_name
-        if restaurant_obj and not restaurant_obj.is_main_restaurant and restaurant_obj.parent_restaurant:
-            display_name = restaurant_obj.parent_restaurant.name
-        
-        context = {
-            'form': form,
-            'restaurant': restaurant,
-            'qr_code': qr_code,
-            'display_name': display_name
-        }
-        return render(request, 'accounts/customer_register.html', context)
+            # This is what select_table expects: User.objects.get(id=selected_restaurant_id)
+            request.session.update({
+                'selected_restaurant_id': access['owner_id'],
+                'selected_restaurant_name': access['restaurant_name'],
+                'access_method': 'qr_code',
+            })
+            
+            # Use display name for message (main restaurant name for branches)
+            messages.success(request, f'Welcome to {display_name}! Account created successfully.')
+            return redirect('orders:select_table')
+            
+    else:
+        form = CustomerRegistrationForm()
         
-    except User.DoesNotExist:
-        messages.error(request, 'Invalid QR code. Restaurant not found.')
-        return redirect('accounts:login')
+        # Store restaurant info in session for GET requests too
+        # This ensures session data is available even if user refreshes
+        # ALWAYS store the USER (owner) ID, NOT the Restaurant object ID
+        request.session.update({
+            'selected_restaurant_id': access['owner_id'],
+            'selected_restaurant_name': access['restaurant_name'],
+            'access_method': 'qr_code',
+        })
+    
+    context = {
+        'form': form,
+        'restaurant': access['contact'],
+        'qr_code': qr_code,
+        'display_name': display_name
+    }
+    return render(request, 'accounts/customer_register.html', context)
+
+
+def _json_response(payload):
+    """JsonResponse equivalent, serialized with orjson"""
+    return HttpResponse(orjson.dumps(payload), content_type='application/json')
 
 
 @login_required
@@ -525,35 +507,34 @@ def customer_register_view(request, qr_code):
 def update_tax_rate(request):
     """Update restaurant owner's tax rate"""
     if not request.user.is_owner():
-        return JsonResponse({'success': False, 'message': 'Only restaurant owners can update tax rates.'})
+        return _json_response({'success': False, 'message': 'Only restaurant owners can update tax rates.'})
     
     try:
-        data = json.loads(request.body)
+        data = orjson.loads(request.body)
         tax_rate = Decimal(str(data.get('tax_rate', 0)))
         
         # Validate tax rate (0% to 99.99%)
         if tax_rate < 0 or tax_rate > Decimal('0.9999'):
-            return JsonResponse({'success': False, 'message': 'Tax rate must be between 0% and 99.99%'})
+            return _json_response({'success': False, 'message': 'Tax rate must be between 0% and 99.99%'})
         
-        # Update user's tax rate
+        # Update user's tax rate - single-column UPDATE; save() would also rewrite
+        # the role/owner/QR fields it derives, and nothing listens for tax changes
+        User.objects.filter(pk=request.user.pk).update(tax_rate=tax_rate)
         request.user.tax_rate = tax_rate
-        request.user.save()
         
-        return JsonResponse({'success': True, 'message': 'Tax rate updated successfully',
-                            'tax_rate_percentage': float(tax_rate * 100)})
+        return _json_response({'success': True, 'message': 'Tax rate updated successfully',
+                               'tax_rate_percentage': float(tax_rate * 100)})
         
-    except (json.JSONDecodeError, ValueError, TypeError) as e:
-        return JsonResponse({'success': False, 'message': 'Invalid tax rate value'})
+    except (orjson.JSONDecodeError, ValueError, TypeError) as e:
+        return _json_response({'success': False, 'message': 'Invalid tax rate value'})
     except Exception as e:
-        return JsonResponse({'success': False, 'message': 'An error occurred while updating tax rate'})
+        return _json_response({'success': False, 'message': 'An error occurred while updating tax rate'})
 
 
 def access_blocked_view(request):
     """
     View for displaying access blocked page when subscription is inactive
     """
-    from django.utils import timezone
-    
     # Get the reason from URL parameters
     reason = request.GET.get('reason', 'Your restaurant subscription has expired or access has been restricted.')
     
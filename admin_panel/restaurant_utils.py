@@ -1,11 +1,47 @@
 """
 Utility functions for restaurant data filtering based on user roles
 """
-from django.db.models import Q
+from functools import lru_cache
+
+from django.db.models import Case, IntegerField, Q, When
 from restaurant.models_restaurant import Restaurant
 
 
-def get_user_restaurants(user):
+# Shared result for users without an owner role; an empty queryset never
+# touches the database, so one instance can serve every caller
+_EMPTY_RESTAURANTS = Restaurant.objects.none()
+
+
+# The owner filters below (optionally narrowed by is_main_restaurant) are served
+# by the (main_owner, is_main_restaurant) and (branch_owner, is_main_restaurant)
+# indexes on Restaurant.
+def _accessible_restaurants_q(user, role):
+    """Filter selecting the restaurants the user can access, or None for no access"""
+    if role == 'main_owner':
+        return Q(main_owner=user)
+    elif role == 'branch_owner':
+        return Q(branch_owner=user)
+    elif role == 'owner':
+        return Q(main_owner=user) | Q(branch_owner=user)
+    return None
+
+
+def _user_restaurants_queryset(user, role):
+    access = _accessible_restaurants_q(user, role)
+    if access is None:
+        return _EMPTY_RESTAURANTS
+    # Views loop over these rows touching main_owner/branch_owner, and read the
+    # name, flags, QR code, address and printer settings; only the free-text
+    # description is unused
+    restaurants = Restaurant.objects.filter(access).select_related(
+        'main_owner', 'branch_owner'
+    ).defer('description')
+    if role == 'main_owner':
+        return restaurants.order_by('-is_main_restaurant', 'name')
+    return restaurants.order_by('name')
+
+
+def get_user_restaurants(user, request=None, *, role=None):
     """
     Get restaurants accessible to the current user based on their role
     
@@ -13,52 +49,116 @@ def get_user_restaurants(user):
     - Main owners: All restaurants they own (main + branches)
     - Branch owners: Only their assigned branch
     - Regular owners: Their restaurants (backward compatibility)
+    
+    The queryset is memoized on the request (or on the user when there is no
+    request), so once it has been evaluated the helpers below reuse its rows
+    instead of querying again. Callers that already resolved the user's role
+    can pass it as ``role``.
     """
-    if user.is_main_owner():
-        return Restaurant.objects.filter(main_owner=user).order_by('-is_main_restaurant', 'name')
-    elif user.is_branch_owner():
-        return Restaurant.objects.filter(branch_owner=user).order_by('name')
-    elif user.is_owner() and not user.is_main_owner():
-        return Restaurant.objects.filter(
-            Q(main_owner=user) | Q(branch_owner=user)
-        ).order_by('name')
-    else:
-        return Restaurant.objects.none()
+    holder = request if request is not None else user
+    cached = getattr(holder, '_user_restaurants_cache', None)
+    if cached is not None and cached[0] == user.pk:
+        return cached[1]
+    restaurants = _user_restaurants_queryset(user, role if role is not None else user.role_name)
+    holder._user_restaurants_cache = (user.pk, restaurants)
+    return restaurants
+
+
+# Which accessible restaurant each owner role falls back to when none is selected:
+# main owners get their main restaurant, branch and legacy owners the first one
+_DEFAULT_RESTAURANT_MATCH = {
+    'main_owner': {'is_main_restaurant': True},
+    'branch_owner': {},
+    'owner': {},
+}
+
+
+def _find_restaurant(restaurants, **attrs):
+    """First restaurant from an evaluated queryset whose attributes all match"""
+    for restaurant in restaurants:
+        if all(getattr(restaurant, name) == value for name, value in attrs.items()):
+            return restaurant
+    return None
+
+
+def _selected_restaurant(restaurants, owner_id):
+    """Restaurant picked by an owner's user ID: their branch, or the main restaurant they own"""
+    if owner_id is None:
+        return None
+    for restaurant in restaurants:
+        if restaurant.is_main_restaurant:
+            if restaurant.main_owner_id == owner_id:
+                return restaurant
+        elif restaurant.branch_owner_id == owner_id:
+            return restaurant
+    return None
+
+
+def _session_id(value):
+    """Session IDs may be stored as int or str; anything else matches nothing"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
-def get_current_restaurant(user, session_restaurant_id=None):
+def _first_unordered(queryset):
+    """First row of a queryset without the ORDER BY that .first() would add"""
+    for obj in queryset.order_by()[:1]:
+        return obj
+    return None
+
+
+def get_current_restaurant(user, session_restaurant_id=None, request=None):
     """
     Get the current active restaurant for the user
     
     For branch owners: Always their assigned restaurant
     For main owners: Session restaurant or main restaurant
+    
+    With a request the per-request restaurant list is reused; without one,
+    only the single row needed is fetched.
     """
-    accessible_restaurants = get_user_restaurants(user)
-    
-    if user.is_branch_owner():
-        # Branch owners can only work with their assigned restaurant
-        return accessible_restaurants.first()
-    
-    elif user.is_main_owner():
-        # Main owners can switch between their restaurants
-        if session_restaurant_id:
-            try:
-                return accessible_restaurants.get(id=session_restaurant_id)
-            except Restaurant.DoesNotExist:
-                pass
-        # Default to main restaurant
-        return accessible_restaurants.filter(is_main_restaurant=True).first()
-    
-    elif user.is_owner():
-        # Regular owners (backward compatibility)
-        if session_restaurant_id:
-            try:
-                return accessible_restaurants.get(id=session_restaurant_id)
-            except Restaurant.DoesNotExist:
-                pass
-        return accessible_restaurants.first()
+    role = user.role_name
+    access = _accessible_restaurants_q(user, role)
+    if access is None:
+        return None
+    # Branch owners can only work with their assigned restaurant
+    selected_id = None if role == 'branch_owner' else _session_id(session_restaurant_id)
     
-    return None
+    if request is not None:
+        accessible_restaurants = get_user_restaurants(user, request, role=role)
+        if selected_id is not None:
+            restaurant = _find_restaurant(accessible_restaurants, id=selected_id)
+            if restaurant:
+                return restaurant
+        return _find_restaurant(accessible_restaurants, **_DEFAULT_RESTAURANT_MATCH[role])
+    
+    default_match = _DEFAULT_RESTAURANT_MATCH[role]
+    if selected_id is None:
+        # Lookups by a unique key need no sort before the LIMIT
+        if default_match:
+            return _first_unordered(Restaurant.objects.filter(access, **default_match))
+        # Branch and legacy owners keep the name ordering to pick a default
+        return _user_restaurants_queryset(user, role).first()
+    
+    # One round-trip: the selected restaurant if accessible, else the role default
+    candidates = Restaurant.objects.filter(access)
+    if default_match:
+        candidates = candidates.filter(Q(id=selected_id) | Q(**default_match))
+    return candidates.order_by(
+        Case(When(id=selected_id, then=0), default=1, output_field=IntegerField()),
+        'name',
+    ).first()
+
+
+@lru_cache(maxsize=None)
+def _has_restaurant_column(model):
+    """Whether the model stores a restaurant_id column, resolved once per model class"""
+    return any(
+        getattr(field, 'attname', None) == 'restaurant_id'
+        for field in model._meta.concrete_fields
+    )
 
 
 def filter_data_by_restaurant(queryset, user, current_restaurant=None):
@@ -72,85 +172,74 @@ def filter_data_by_restaurant(queryset, user, current_restaurant=None):
     
     Returns filtered queryset
     """
+    # A restaurant FK always exposes restaurant_id, so one column covers both cases
+    if not _has_restaurant_column(queryset.model):
+        # If no restaurant field, return all (for models not restaurant-specific)
+        return queryset
+    
     if current_restaurant:
         # Filter by specific restaurant
-        if hasattr(queryset.model, 'restaurant'):
-            return queryset.filter(restaurant=current_restaurant)
-        elif hasattr(queryset.model, 'restaurant_id'):
-            return queryset.filter(restaurant_id=current_restaurant.id)
+        return queryset.filter(restaurant_id=current_restaurant.id)
     
-    # Filter by all user's accessible restaurants
-    accessible_restaurants = get_user_restaurants(user)
-    
-    if hasattr(queryset.model, 'restaurant'):
-        return queryset.filter(restaurant__in=accessible_restaurants)
-    elif hasattr(queryset.model, 'restaurant_id'):
-        return queryset.filter(restaurant_id__in=accessible_restaurants.values_list('id', flat=True))
-    
-    # If no restaurant field, return all (for models not restaurant-specific)
-    return queryset
+    # Filter by all user's accessible restaurants with an unordered id subquery
+    access = _accessible_restaurants_q(user, user.role_name)
+    if access is None:
+        return queryset.none()
+    return queryset.filter(restaurant_id__in=Restaurant.objects.filter(access).values('id'))
 
 
 def can_access_restaurant(user, restaurant):
     """
     Check if user can access a specific restaurant
     """
-    accessible_restaurants = get_user_restaurants(user)
-    return accessible_restaurants.filter(id=restaurant.id).exists()
+    access = _accessible_restaurants_q(user, user.role_name)
+    if access is None:
+        return False
+    return Restaurant.objects.filter(access, id=restaurant.id).exists()
 
 
 def get_restaurant_context(user, session_restaurant_id=None, request=None):
     """
     Get standardized restaurant context for views
     
-    Returns dictionary with restaurant context variables
+    Returns dictionary with restaurant context variables. The accessible
+    restaurants are fetched once; the current pick, the default and the
+    switch flag are all derived from those rows, so the context costs a
+    single query.
     """
-    accessible_restaurants = get_user_restaurants(user)
+    role = user.role_name
+    # Session values may be int or str; coerce once (None when unusable)
+    selected_id = _session_id(session_restaurant_id)
+    accessible_restaurants = get_user_restaurants(user, request, role=role)
     
     # Determine view mode - check session if available
     view_all_restaurants = False
     if request and hasattr(request, 'session'):
         view_all_restaurants = request.session.get('view_all_restaurants', False)
     
+    # Views, mixins and helpers may ask again within one request; the answer
+    # only changes with the user and the session selection
+    cache_key = (user.pk, selected_id, view_all_restaurants)
+    cached = getattr(request, '_restaurant_context_cache', None)
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+    
     # Get current restaurant based on session or default
     current_restaurant = None
     
     if session_restaurant_id and not view_all_restaurants:
         # session_restaurant_id stores User (owner) ID, not Restaurant ID
         # User has selected a specific restaurant and not in "view all" mode
-        try:
-            from accounts.models import User
-            selected_user = User.objects.get(id=session_restaurant_id)
-            
-            # Find the Restaurant object for this user
-            if selected_user.is_branch_owner():
-                current_restaurant = accessible_restaurants.filter(branch_owner=selected_user, is_main_restaurant=False).first()
-            else:
-                current_restaurant = accessible_restaurants.filter(main_owner=selected_user, is_main_restaurant=True).first()
-            
-            if not current_restaurant:
-                # Invalid restaurant in session, clear it
-                if request and hasattr(request, 'session'):
-                    if 'selected_restaurant_id' in request.session:
-                        del request.session['selected_restaurant_id']
-        except User.DoesNotExist:
-            # Invalid user in session, clear it
+        current_restaurant = _selected_restaurant(accessible_restaurants, selected_id)
+        
+        if not current_restaurant:
+            # Invalid restaurant or user in session, clear it
             if request and hasattr(request, 'session'):
-                if 'selected_restaurant_id' in request.session:
-                    del request.session['selected_restaurant_id']
-            current_restaurant = None
+                request.session.pop('selected_restaurant_id', None)
     
     # If no current restaurant and not viewing all, set a default
-    if not current_restaurant and not view_all_restaurants:
-        if user.is_branch_owner():
-            # Branch owners always work with their assigned restaurant
-            current_restaurant = accessible_restaurants.first()
-        elif user.is_main_owner():
-            # Main owners default to main restaurant unless viewing all
-            current_restaurant = accessible_restaurants.filter(is_main_restaurant=True).first()
-        elif user.is_owner():
-            # Regular owners default to their restaurant
-            current_restaurant = accessible_restaurants.first()
+    if not current_restaurant and not view_all_restaurants and role in _DEFAULT_RESTAURANT_MATCH:
+        current_restaurant = _find_restaurant(accessible_restaurants, **_DEFAULT_RESTAURANT_MATCH[role])
     
     # If view_all_restaurants is True, current_restaurant should be None for aggregated views
     if view_all_restaurants:
@@ -164,11 +253,18 @@ def get_restaurant_context(user, session_restaurant_id=None, request=None):
     else:
         context_name = "Restaurant System"
     
-    return {
+    # Main owners can always switch; otherwise count the rows already loaded
+    # above (views iterate this list anyway, so len() costs no extra query)
+    can_switch_restaurants = role == 'main_owner' or len(accessible_restaurants) > 1
+    
+    context = {
         'current_restaurant': current_restaurant,
         'accessible_restaurants': accessible_restaurants,
         'view_all_restaurants': view_all_restaurants,
         'restaurant_name': context_name,
         'can_manage_branches': user.can_access_branch_features(),
-        'can_switch_restaurants': len(accessible_restaurants) > 1 or user.is_main_owner(),
-    }
\ No newline at end of file
+        'can_switch_restaurants': can_switch_restaurants,
+    }
+    if request is not None:
+        request._restaurant_context_cache = (cache_key, context)
+    return context
\ No newline at end of file
@@ -69,6 +69,7 @@ def admin_dashboard(request):
         
         if selected_restaurant_id and not view_all_restaurants:
             # selected_restaurant_id stores User (owner) ID, not Restaurant ID
+            clear_selection = False
             try:
                 selected_user = User.objects.get(id=selected_restaurant_id)
                 
@@ -81,12 +82,14 @@ def admin_dashboard(request):
                 # Verify user can access this restaurant
                 if current_restaurant and not current_restaurant.can_user_access(request.user):
                     current_restaurant = None
-                    if 'selected_restaurant_id' in request.session:
-                        del request.session['selected_restaurant_id']
+                    clear_selection = True
             except User.DoesNotExist:
                 current_restaurant = None
-                if 'selected_restaurant_id' in request.session:
-                    del request.session['selected_restaurant_id']
+                clear_selection = True
+            
+            if clear_selection:
+                # Invalid selection: drop it once, so the session is written once
+                request.session.pop('selected_restaurant_id', None)
         
         # If no current restaurant selected, auto-select for non-main owners
         if not current_restaurant and not view_all_restaurants:
@@ -3291,17 +3294,17 @@ def profile(request):
                     # Update main restaurant if user is main_owner
                     if request.user.is_main_owner():
                         restaurants = Restaurant.objects.filter(main_owner=request.user)
-                        restaurants.update(currency_code=currency_code)
+                        Restaurant.update_currency_code(restaurants, currency_code)
                     # Update specific branch if user is branch_owner
                     elif request.user.is_branch_owner():
                         restaurants = Restaurant.objects.filter(branch_owner=request.user)
-                        restaurants.update(currency_code=currency_code)
+                        Restaurant.update_currency_code(restaurants, currency_code)
                     # For legacy owner role
                     else:
                         restaurants = Restaurant.objects.filter(
                             models.Q(main_owner=request.user) | models.Q(branch_owner=request.user)
                         )
-                        restaurants.update(currency_code=currency_code)
+                        Restaurant.update_currency_code(restaurants, currency_code)
                 except Exception as e:
                     # Restaurant model update failed, but user currency is saved
                     pass
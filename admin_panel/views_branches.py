@@ -15,18 +15,18 @@ import logging
 from accounts.models import User, Role
 from restaurant.models_restaurant import Restaurant
 
-# Import bleach for input sanitization
+# Import nh3 for input sanitization
 try:
-    import bleach
+    import nh3
     def sanitize_input(text, max_length=500):
         """Sanitize text input to prevent XSS"""
         if not text:
             return ''
         # Strip all HTML tags and limit length
-        return bleach.clean(str(text), tags=[], strip=True)[:max_length]
+        return nh3.clean(str(text), tags=set())[:max_length]
 except ImportError:
     def sanitize_input(text, max_length=500):
-        """Fallback sanitization without bleach"""
+        """Fallback sanitization without nh3"""
         if not text:
             return ''
         import html
@@ -657,10 +657,8 @@ def set_view_all_restaurants(request):
         return JsonResponse({'success': False, 'error': 'Permission denied'})
     
     # Clear restaurant selection to show all restaurants
-    if 'selected_restaurant_id' in request.session:
-        del request.session['selected_restaurant_id']
-    if 'selected_restaurant_name' in request.session:
-        del request.session['selected_restaurant_name']
+    for key in ('selected_restaurant_id', 'selected_restaurant_name'):
+        request.session.pop(key, None)
     
     request.session['view_all_restaurants'] = True
     
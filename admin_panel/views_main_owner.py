@@ -44,8 +44,7 @@ def main_owner_dashboard(request):
             restaurants = [current_restaurant]  # Only show selected restaurant
         except Restaurant.DoesNotExist:
             # Invalid restaurant, clear session and show all
-            if 'selected_restaurant_id' in request.session:
-                del request.session['selected_restaurant_id']
+            request.session.pop('selected_restaurant_id', None)
             restaurants = base_restaurants.order_by('-is_main_restaurant', 'name')
     else:
         # Viewing all restaurants
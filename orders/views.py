@@ -19,7 +19,7 @@ from .forms import TableSelectionForm, OrderForm, OrderStatusForm, CancelOrderFo
 from restaurant.models import TableInfo, Product, MainCategory
 from accounts.models import User, get_owner_filter, check_owner_permission
 from accounts.security_utils import (
-    validate_session_restaurant_id, 
+    get_session_restaurant,
     validate_session_table,
     validate_cart_data,
     sanitize_special_instructions,
@@ -41,17 +41,10 @@ channel_layer = get_channel_layer()
 def select_table(request):
     """Customer selects table from available tables in restaurant"""
     # Validate restaurant from session (already validated by decorator)
-    restaurant = validate_session_restaurant_id(request.session)
+    restaurant = get_session_restaurant(request)
     
     # For staff users, get their assigned restaurant
-    if request.user.is_authenticated and (
-        request.user.is_customer_care() or 
-        request.user.is_kitchen_staff() or 
-        request.user.is_bar_staff() or 
-        request.user.is_buffet_staff() or 
-        request.user.is_service_staff() or 
-        request.user.is_cashier()
-    ):
+    if request.user.is_authenticated and request.user.is_restaurant_staff():
         restaurant = request.user.get_owner()
         if restaurant:
             request.session['selected_restaurant_id'] = restaurant.id
@@ -118,7 +111,7 @@ def browse_menu(request):
     """Browse menu and add items to cart"""
     # Session validated by decorators
     table_number = request.session['selected_table']
-    restaurant = validate_session_restaurant_id(request.session)
+    restaurant = get_session_restaurant(request)
     
     # Filter categories by restaurant
     try:
@@ -179,7 +172,7 @@ def add_to_cart(request):
         return JsonResponse({'success': False, 'message': 'Please select a table first.'})
     
     # Validate restaurant context
-    restaurant = validate_session_restaurant_id(request.session)
+    restaurant = get_session_restaurant(request)
     if not restaurant:
         return JsonResponse({'success': False, 'message': 'Restaurant context lost. Please scan QR code again.'})
     
@@ -278,7 +271,7 @@ def remove_from_cart(request):
     """Remove item from cart via AJAX"""
     try:
         # Validate restaurant context to prevent cross-restaurant manipulation
-        restaurant = validate_session_restaurant_id(request.session)
+        restaurant = get_session_restaurant(request)
         if not restaurant:
             return JsonResponse({'success': False, 'message': 'Invalid session. Please select a restaurant.'})
         
@@ -341,7 +334,7 @@ def update_cart_quantity(request):
             return JsonResponse({'success': False, 'message': 'Invalid product.'})
         
         # Validate restaurant context
-        restaurant = validate_session_restaurant_id(request.session)
+        restaurant = get_session_restaurant(request)
         if not restaurant:
             return JsonResponse({'success': False, 'message': 'Restaurant context lost.'})
         
@@ -427,7 +420,7 @@ def view_cart(request):
         })
     
     # Get restaurant owner's tax rate from validated session
-    restaurant = validate_session_restaurant_id(request.session)
+    restaurant = get_session_restaurant(request)
     tax_rate = float(restaurant.tax_rate) if restaurant else float(Decimal('0.0800'))
     
     # Calculate tax and final total
@@ -465,10 +458,10 @@ def place_order(request):
             try:
                 with transaction.atomic():
                     # Get current restaurant from validated session
-                    current_restaurant = validate_session_restaurant_id(request.session)
+                    current_restaurant = get_session_restaurant(request)
                     
                     # For staff users, use their assigned restaurant
-                    if request.user.is_customer_care() or request.user.is_kitchen_staff() or request.user.is_bar_staff() or request.user.is_buffet_staff() or request.user.is_service_staff() or request.user.is_cashier():
+                    if request.user.is_restaurant_staff():
                         current_restaurant = request.user.get_owner()
                         if not current_restaurant:
                             messages.error(request, 'You are not assigned to any restaurant. Please contact your administrator.')
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0016_add_performance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['main_owner', 'is_main_restaurant'], name='restaurant__main_ow_c137a0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['branch_owner', 'is_main_restaurant'], name='restaurant__branch__15f680_idx'),
+        ),
+    ]
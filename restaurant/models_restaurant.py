@@ -4,12 +4,21 @@ Supports main owners with multiple branches based on subscription plans.
 """
 
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from decimal import Decimal
 import uuid
 
+from accounts.models import QR_ACCESS_CACHE_KEY, clear_qr_access_cache
+
 User = get_user_model()
 
+# Currency of the restaurant an owner runs, cached for the currency template tags
+OWNER_CURRENCY_CACHE_KEY = 'restaurant_currency:{}'
+OWNER_CURRENCY_CACHE_TIMEOUT = 300  # seconds
+
 
 class Restaurant(models.Model):
     """
@@ -138,6 +147,9 @@ class Restaurant(models.Model):
         'JPY': '¥',
     }
     
+    # Currencies that typically use integer values
+    INTEGER_CURRENCIES = frozenset({'KES', 'TZS', 'UGX', 'RWF', 'JPY'})
+    
     currency_code = models.CharField(
         max_length=3,
         choices=CURRENCY_CHOICES,
@@ -215,6 +227,11 @@ class Restaurant(models.Model):
         verbose_name = "Restaurant"
         verbose_name_plural = "Restaurants"
         ordering = ['main_owner__username', 'is_main_restaurant', 'name']
+        indexes = [
+            # Owner scoping in admin_panel.restaurant_utils: main/branch lookups
+            models.Index(fields=['main_owner', 'is_main_restaurant']),
+            models.Index(fields=['branch_owner', 'is_main_restaurant']),
+        ]
         
         # Constraints
         constraints = [
@@ -355,12 +372,44 @@ class Restaurant(models.Model):
         try:
             amount = float(amount)
             # For currencies that typically use integer values
-            if self.currency_code in ['KES', 'TZS', 'UGX', 'RWF', 'JPY']:
+            if self.currency_code in self.INTEGER_CURRENCIES:
                 return f"{symbol}{amount:,.0f}"
             return f"{symbol}{amount:,.2f}"
         except (TypeError, ValueError):
             return f"{symbol}0.00"
     
+    @classmethod
+    def get_owner_currency_code(cls, owner):
+        """
+        Currency code of the restaurant this owner runs (their branch for branch
+        owners, the main restaurant otherwise), or None. Cached per owner.
+        """
+        def load():
+            if owner.is_branch_owner():
+                restaurants = cls.objects.filter(branch_owner=owner, is_main_restaurant=False)
+            else:
+                restaurants = cls.objects.filter(main_owner=owner, is_main_restaurant=True)
+            restaurant = restaurants.only('currency_code').first()
+            # '' caches "no restaurant" so it isn't re-queried either
+            return restaurant.currency_code if restaurant else ''
+        
+        return cache.get_or_set(
+            OWNER_CURRENCY_CACHE_KEY.format(owner.pk), load, OWNER_CURRENCY_CACHE_TIMEOUT
+        ) or None
+    
+    @classmethod
+    def update_currency_code(cls, restaurants, currency_code):
+        """
+        Bulk-set the currency of the given restaurants. QuerySet.update() sends
+        no signals, so the owners' cached currency codes are dropped here.
+        """
+        owner_ids = set()
+        for main_owner_id, branch_owner_id in restaurants.values_list('main_owner_id', 'branch_owner_id'):
+            owner_ids.update((main_owner_id, branch_owner_id))
+        owner_ids.discard(None)
+        restaurants.update(currency_code=currency_code)
+        cache.delete_many([OWNER_CURRENCY_CACHE_KEY.format(owner_id) for owner_id in owner_ids])
+    
     @classmethod
     def get_accessible_restaurants(cls, user):
         """Get all restaurants accessible by the user"""
@@ -378,4 +427,57 @@ class Restaurant(models.Model):
                 models.Q(main_owner=user.owner) | models.Q(branch_owner=user.owner)
             )
         else:
-            return cls.objects.none()
\ No newline at end of file
+            return cls.objects.none()
+
+
+def sync_pro_plan(owner_ids):
+    """Recompute User.has_pro_plan from each owner's main restaurant plan"""
+    for owner_id in set(owner_ids) - {None}:
+        plan = Restaurant.objects.filter(
+            main_owner_id=owner_id, is_main_restaurant=True
+        ).order_by('name').values_list('subscription_plan', flat=True).first()
+        User.objects.filter(pk=owner_id).update(has_pro_plan=plan == 'PRO')
+
+
+@receiver(pre_save, sender=Restaurant)
+def remember_main_owner(sender, instance, **kwargs):
+    """Keep the stored owner/main flag so a change of hands resyncs the old owner too"""
+    instance._previous_main = None
+    if instance.pk:
+        instance._previous_main = Restaurant.objects.filter(pk=instance.pk).values_list(
+            'main_owner_id', 'is_main_restaurant'
+        ).first()
+
+
+@receiver(post_save, sender=Restaurant)
+def sync_main_owner_pro_plan(sender, instance, **kwargs):
+    """Mirror the main restaurant's plan onto User.has_pro_plan"""
+    owner_ids = set()
+    if instance.is_main_restaurant:
+        owner_ids.add(instance.main_owner_id)
+    previous = getattr(instance, '_previous_main', None)
+    if previous and previous[1]:
+        owner_ids.add(previous[0])
+    sync_pro_plan(owner_ids)
+
+
+@receiver(post_delete, sender=Restaurant)
+def clear_main_owner_pro_plan(sender, instance, **kwargs):
+    """A removed main restaurant may leave its owner on another plan, or none"""
+    if instance.is_main_restaurant:
+        sync_pro_plan([instance.main_owner_id])
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def clear_owner_currency_cache(sender, instance, **kwargs):
+    """Drop the cached currency for both owners of a changed restaurant"""
+    owner_ids = {instance.main_owner_id, instance.branch_owner_id} - {None}
+    cache.delete_many([OWNER_CURRENCY_CACHE_KEY.format(owner_id) for owner_id in owner_ids])
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def clear_restaurant_qr_access_cache(sender, instance, **kwargs):
+    """Drop the cached QR resolutions this restaurant feeds into"""
+    # A deleted restaurant's own code can't be found through its owners
+    cache.delete(QR_ACCESS_CACHE_KEY.format(instance.qr_code))
+    clear_qr_access_cache([instance.main_owner_id, instance.branch_owner_id])
@@ -29,14 +29,7 @@ def menu(request):
     current_restaurant = None
     
     # For staff users (customer_care, kitchen, bar, buffet, service, cashier), use their assigned restaurant
-    if request.user.is_authenticated and (
-        request.user.is_customer_care() or 
-        request.user.is_kitchen_staff() or 
-        request.user.is_bar_staff() or 
-        request.user.is_buffet_staff() or 
-        request.user.is_service_staff() or 
-        request.user.is_cashier()
-    ):
+    if request.user.is_authenticated and request.user.is_restaurant_staff():
         # Staff users get their restaurant from User.owner
         current_restaurant = request.user.get_owner()
         if current_restaurant:
@@ -71,13 +71,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parse each template once per process; render() then reuses the
+            # compiled Template (DEBUG still reloads edited files)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.currency_ctx',
             ],
         },
     },
@@ -345,7 +353,7 @@ MIDDLEWARE.insert(1, 'restaurant_system.production_settings.SecurityHeadersMiddl
 # Django-Axes Configuration (Failed Login Tracking)
 AUTHENTICATION_BACKENDS = [
     'axes.backends.AxesStandaloneBackend',
-    'django.contrib.auth.backends.ModelBackend',
+    'accounts.backends.RoleModelBackend',
 ]
 
 # Axes Settings - Production-Ready Configuration for Enterprise Use
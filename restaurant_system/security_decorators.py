@@ -9,6 +9,21 @@ from django.shortcuts import render
 from django.http import HttpResponse
 
 
+def _rate_limited_response(request, message, retry_after):
+    """429 page with a Retry-After header"""
+    response = render(request, 'accounts/rate_limited.html', {
+        'message': message,
+        'retry_after': retry_after,
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+# Counters live in RATELIMIT_USE_CACHE ('default', i.e. Redis), so the limits are
+# shared by every worker. The login and registration limiters use block=False and
+# check request.limited themselves: block=True raises Ratelimited (a 403) before
+# the wrapper could answer with the 429 page.
+
 def rate_limit_login(func):
     """
     Rate limiter for login attempts
@@ -17,17 +32,15 @@ def rate_limit_login(func):
     - Rate limiting is per IP address
     """
     @wraps(func)
-    @ratelimit(key='ip', rate='20/m', block=True, method='POST')  # 20 attempts per minute - BLOCKS if exceeded
-    @ratelimit(key='ip', rate='60/h', block=True, method='POST')  # 60 attempts per hour - BLOCKS if exceeded
+    @ratelimit(key='ip', rate='20/m', block=False, method='POST')  # 20 attempts per minute
+    @ratelimit(key='ip', rate='60/h', block=False, method='POST')  # 60 attempts per hour
     def wrapper(request, *args, **kwargs):
         # Check if rate limited
-        was_limited = getattr(request, 'limited', False)
-        if was_limited:
+        if getattr(request, 'limited', False):
             # Show custom rate limit page instead of 403
-            return render(request, 'accounts/rate_limited.html', {
-                'message': 'Too many login attempts. Please wait a moment before trying again.',
-                'retry_after': 60,
-            }, status=429)
+            return _rate_limited_response(
+                request, 'Too many login attempts. Please wait a moment before trying again.', 60
+            )
         return func(request, *args, **kwargs)
     return wrapper
 
@@ -81,9 +94,13 @@ def rate_limit_registration(func):
     - 10 registrations per day per IP
     """
     @wraps(func)
-    @ratelimit(key='ip', rate='3/h', block=True, method='POST')
-    @ratelimit(key='ip', rate='10/d', block=True, method='POST')
+    @ratelimit(key='ip', rate='3/h', block=False, method='POST')
+    @ratelimit(key='ip', rate='10/d', block=False, method='POST')
     def wrapper(request, *args, **kwargs):
+        if getattr(request, 'limited', False):
+            return _rate_limited_response(
+                request, 'Too many registrations from this network. Please try again later.', 3600
+            )
         return func(request, *args, **kwargs)
     return wrapper
 
@@ -135,6 +152,9 @@ def rate_limited_view(request, exception=None):
     """
     Custom view when rate limit is exceeded
     """
-    return render(request, 'accounts/rate_limited.html', {
-        'retry_after': getattr(exception, 'retry_after', 60),
+    retry_after = getattr(exception, 'retry_after', 60)
+    response = render(request, 'accounts/rate_limited.html', {
+        'retry_after': retry_after,
     }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
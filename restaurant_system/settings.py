@@ -78,13 +78,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parse each template once per process; render() then reuses the
+            # compiled Template (DEBUG still reloads edited files)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.currency_ctx',
             ],
         },
     },
@@ -168,6 +176,10 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 # Session Configuration
+# Reads come from the cache (Redis when available, see CACHES below); writes also
+# go to the database so sessions survive a cache restart
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -230,7 +242,7 @@ MIDDLEWARE.insert(1, 'restaurant_system.settings.SecurityHeadersMiddleware')
 # Protects against brute force attacks
 AUTHENTICATION_BACKENDS = [
     'axes.backends.AxesStandaloneBackend',  # AxesStandaloneBackend should be first
-    'django.contrib.auth.backends.ModelBackend',
+    'accounts.backends.RoleModelBackend',  # ModelBackend that joins role and owner
 ]
 
 # Axes Settings - Production-Ready Configuration for Enterprise Use